@@ -0,0 +1,185 @@
+import hashlib
+import multiprocessing
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+
+from exporters import MAX_SHEET_TITLE, sheet_title, write_csv, write_excel_book
+from playlist_cache import playlist_key
+from playlist_engine import DEFAULT_GRID, SECONDS_PER_DAY, Rotation, generate
+
+
+# Generación por lotes: N días x M canales repartidos en un pool de procesos.
+# Cada canal es una hoja de rellenos; los programas y las promos son comunes.
+# La rotación de promos y rellenos sigue de un día al siguiente dentro de cada
+# canal, así que los días de un canal se generan en orden y los canales en paralelo.
+
+class BatchJob:
+    __slots__ = ("day", "channel", "seed")
+
+    def __init__(self, day, channel, seed):
+        self.day = day
+        self.channel = channel
+        self.seed = seed
+
+    # Nombre usado para los archivos y hojas exportados
+    @property
+    def label(self):
+        return f"{self.channel}_{self.day.isoformat()}"
+
+    def __repr__(self):
+        return f"BatchJob({self.day.isoformat()}, {self.channel!r}, {self.seed})"
+
+
+# Función para derivar una semilla determinística para cada (día, canal)
+def job_seed(base_seed, day, channel):
+    digest = hashlib.sha256(f"{base_seed}:{day.isoformat()}:{channel}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+# Función para armar la lista de trabajos del lote
+def plan_jobs(first_day, days, channels, base_seed=0):
+    return [
+        BatchJob(first_day + timedelta(days=offset), channel, job_seed(base_seed, first_day + timedelta(days=offset), channel))
+        for offset in range(days)
+        for channel in channels
+    ]
+
+
+# Estado de cada proceso del pool: los catálogos se envían una sola vez al
+# iniciar el proceso y no con cada trabajo
+_worker_state = {}
+
+
+def _init_worker(programs, indexes, start_clock, window_seconds, grids):
+    _worker_state.update(
+        programs=programs, indexes=indexes, start_clock=start_clock, window_seconds=window_seconds, grids=grids
+    )
+
+
+# Segundos absolutos en que empieza la ventana del día del trabajo
+def _origin(job, start_clock):
+    return job.day.toordinal() * SECONDS_PER_DAY + start_clock
+
+
+# `rotation` es el estado (Rotation.state()) que dejaron los días anteriores del canal
+def _run_job(job, rotation):
+    state = _worker_state
+    index = state["indexes"][job.channel]
+    rotation = Rotation(
+        index, rng=random.Random(f"rotation:{job.seed}"), state=rotation, origin=_origin(job, state["start_clock"])
+    )
+    playlist = generate(
+        state["start_clock"], state["window_seconds"], state["programs"], index,
+        seed=job.seed, grid=state["grids"].get(job.channel, DEFAULT_GRID), rotation=rotation,
+    )
+    return job, playlist
+
+
+# Función para ejecutar el lote. Devuelve los resultados (trabajo, playlist)
+# a medida que terminan, para que se puedan exportar sin esperar al resto.
+#   programs: lista de (nombre, duración en segundos)
+#   indexes: CatalogIndex por canal
+#   grids: BlockGrid por canal (los canales que faltan usan la grilla estándar)
+#   cache: PlaylistCache opcional; los trabajos ya generados salen de la caché
+#          y solo los demás se reparten en el pool. La clave de cada día incluye
+#          la del día anterior del canal, del que depende la rotación.
+def run_batch(jobs, programs, indexes, start_clock, window_seconds, grids=None, max_workers=None, cache=None):
+    grids = grids or {}
+    # Días pendientes de cada canal, en orden, y la rotación que van dejando
+    days = {}
+    for job in sorted(jobs, key=lambda job: job.day):
+        days.setdefault(job.channel, []).append(job)
+    rotations = {channel: Rotation(indexes[channel]) for channel in days}
+    keys = {}
+    previous = {}
+
+    # Avanza el canal por los días que ya están en la caché (devolviéndolos) y
+    # devuelve el primero que hay que generar, o None si no quedan
+    def advance(channel):
+        while days[channel]:
+            job = days[channel].pop(0)
+            if cache is None:
+                return job
+            grid = grids.get(job.channel, DEFAULT_GRID)
+            key = keys[job.label] = previous[channel] = playlist_key(
+                start_clock, window_seconds, programs, indexes[channel], grid, job.seed, history=previous.get(channel)
+            )
+            playlist = cache.get(key)
+            if playlist is None:
+                return job
+            rotations[channel].observe(playlist, _origin(job, start_clock))
+            yield job, playlist
+        return None
+
+    ready = []
+    for channel in days:
+        job = yield from advance(channel)
+        if job is not None:
+            ready.append(job)
+    if not ready:
+        return
+
+    # Los procesos se crean con forkserver y no con fork: en la aplicación el
+    # pool se abre desde un hilo y un fork podría copiar un lock tomado por otro
+    # hilo (por ejemplo, el de la instrumentación). Cada canal tiene a lo sumo
+    # un día en curso, así que no hacen falta más procesos que canales.
+    with ProcessPoolExecutor(
+        max_workers=min(max_workers or os.cpu_count(), len(ready)),
+        mp_context=multiprocessing.get_context("forkserver"),
+        initializer=_init_worker,
+        initargs=(programs, indexes, start_clock, window_seconds, grids),
+    ) as pool:
+        futures = set()
+
+        def submit(job):
+            futures.add(pool.submit(_run_job, job, rotations[job.channel].state()))
+
+        for job in ready:
+            submit(job)
+        try:
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    futures.discard(future)
+                    job, playlist = future.result()
+                    if cache is not None:
+                        cache.put(keys[job.label], playlist)
+                    rotations[job.channel].observe(playlist, _origin(job, start_clock))
+                    yield job, playlist
+                    job = yield from advance(job.channel)
+                    if job is not None:
+                        submit(job)
+        finally:
+            # Si se deja de consumir el lote (por ejemplo, al cancelarlo) los
+            # trabajos que no empezaron no se ejecutan
+            for future in futures:
+                future.cancel()
+
+
+# Función para exportar los resultados del lote como CSV en un directorio
+def write_batch_csv(results, directory):
+    os.makedirs(directory, exist_ok=True)
+    for job, playlist in results:
+        path = os.path.join(directory, f"{job.label}.csv")
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            write_csv(playlist, file)
+        yield job, path
+
+
+# Función para exportar los resultados del lote a un libro de Excel con una hoja
+# por trabajo, escribiendo cada playlist en cuanto termina. Cada hoja se llama
+# <canal>_<fecha>: si no entra en el largo de Excel se recorta el canal (una
+# sola vez por canal, para que todos sus días usen el mismo nombre) y nunca la fecha.
+def write_batch_excel(results, target):
+    channels = {}
+    used = set()
+
+    def title(job):
+        suffix = f"_{job.day.isoformat()}"
+        if job.channel not in channels:
+            channels[job.channel] = sheet_title(job.channel, used, MAX_SHEET_TITLE - len(suffix))
+        return channels[job.channel] + suffix
+
+    write_excel_book(((title(job), playlist) for job, playlist in results), target)
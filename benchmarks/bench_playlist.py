@@ -0,0 +1,243 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import (  # noqa: E402
+    CatalogCache,
+    CatalogSync,
+    SnapshotStore,
+    load_fillers,
+    load_programs,
+    load_promos,
+)
+from exporters import build_sheet_requests, write_excel_book  # noqa: E402
+from fake_sheets import FakeSheetsClient, populate_synthetic  # noqa: E402
+import playlist_engine  # noqa: E402
+from playlist_engine import (  # noqa: E402
+    DEFAULT_GRID,
+    MAX_BLOCK_GAP,
+    PARTIAL_TANDA_NAME,
+    SECONDS_PER_DAY,
+    BlockBoundaries,
+    BreakFiller,
+    build_catalog_index,
+    generate,
+)
+
+
+# Benchmarks del motor y los exportadores con catálogos sintéticos, sin red:
+#   python benchmarks/bench_playlist.py                      # matriz completa
+#   python benchmarks/bench_playlist.py --quick              # escalas chicas
+#   python benchmarks/bench_playlist.py --save-baseline benchmarks/baseline.json
+#   python benchmarks/bench_playlist.py --compare benchmarks/baseline.json
+#
+# Para cada etapa se informa el rendimiento (elementos/s), la memoria máxima
+# (tracemalloc) y, al generar, los segundos sin llenar ("Tanda Parcial").
+
+CATALOG_SIZES = (10, 1_000, 10_000, 100_000)
+DAY_COUNTS = (1, 7, 30)
+QUICK_CATALOG_SIZES = (10, 1_000)
+QUICK_DAY_COUNTS = (1, 7)
+
+# Pasadas por etapa; se informa la más rápida para reducir el ruido
+DEFAULT_REPEAT = 3
+
+# Caída de rendimiento (fracción) a partir de la cual se considera una regresión
+REGRESSION_THRESHOLD = 0.25
+
+# Etapas más cortas que esto en la línea base son demasiado ruidosas para comparar
+MIN_COMPARABLE_SECONDS = 0.02
+
+CHANNEL = "Canal 1"
+
+# Segundos de programa entre dos tandas consecutivas en la etapa de llenado
+BREAK_SPACING = 1500
+
+
+# Función para crear un backend falso con programas, promos y rellenos sintéticos
+def synthetic_backend(size, seed=0):
+    return populate_synthetic(FakeSheetsClient(), size, seed, channels=(CHANNEL,))
+
+
+# Función para medir una etapa: el tiempo es el mejor de `repeat` pasadas y
+# una pasada extra con tracemalloc da la memoria máxima.
+# `stage` devuelve (elementos, extras).
+def measure(stage, repeat=DEFAULT_REPEAT):
+    elapsed = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count, extras = stage()
+        lap = time.perf_counter() - started
+        elapsed = lap if elapsed is None else min(elapsed, lap)
+
+    tracemalloc.start()
+    stage()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "items": count,
+        "seconds": round(elapsed, 6),
+        "items_per_second": round(count / elapsed, 1) if elapsed > 0 else None,
+        "peak_kib": round(peak / 1024, 1),
+    }
+    result.update(extras)
+    return result
+
+
+def run_scale(size, days, seed=0, repeat=DEFAULT_REPEAT):
+    results = {}
+    client = synthetic_backend(size, seed)
+    directory = tempfile.mkdtemp(prefix="vjd-bench-")
+
+    def load_stage():
+        # Cada pasada usa una copia local nueva para medir la descarga completa
+        sync = CatalogSync(client, SnapshotStore(os.path.join(directory, f"{time.perf_counter_ns()}.sqlite")))
+        cache = CatalogCache()
+        messages = []
+        programs = load_programs(sync, cache, messages)
+        promos = load_promos(sync, cache, messages)
+        fillers = load_fillers(sync, cache, CHANNEL, messages)
+        load_stage.catalogs = programs, promos, fillers
+        return len(programs) + len(promos) + len(fillers), {}
+
+    results["load_catalog"] = measure(load_stage, repeat)
+    programs, promos, fillers = load_stage.catalogs
+    parsed_programs = [(program["name"], program["duration"]) for program in programs]
+
+    def index_stage():
+        index_stage.index = build_catalog_index(promos, fillers)
+        return len(index_stage.index), {}
+
+    results["build_index"] = measure(index_stage, repeat)
+    index = index_stage.index
+
+    rng = random.Random(seed)
+    breaks = [rng.randint(1, MAX_BLOCK_GAP) for _ in range(1_000)]
+
+    # Llenado de tandas sobre el índice ya construido (incluye armar la tabla)
+    def select_stage():
+        playlist_engine._fill_table.cache_clear()
+        filler = BreakFiller(index, rng=random.Random(seed))
+        unfilled = 0
+        now = 0
+        for seconds in breaks:
+            unfilled += filler.select(seconds, now)[1]
+            now += seconds + BREAK_SPACING
+        return len(breaks), {"unfilled_seconds": unfilled, "rotation_conflicts": filler.rotation.conflicts}
+
+    results["fill_breaks"] = measure(select_stage, repeat)
+
+    def next_block_stage():
+        boundaries = BlockBoundaries(DEFAULT_GRID, 0, SECONDS_PER_DAY)
+        total = 0
+        for clock in range(0, SECONDS_PER_DAY, 7):
+            total += boundaries.seconds_to_next(clock)
+        return SECONDS_PER_DAY // 7, {}
+
+    results["next_block"] = measure(next_block_stage, repeat)
+
+    # La lista de programas se repite para cubrir todos los días pedidos
+    day_programs = parsed_programs * (SECONDS_PER_DAY // 1320 // len(parsed_programs) + 1)
+
+    def generate_stage():
+        playlist_engine._fill_table.cache_clear()
+        playlists = [generate(0, SECONDS_PER_DAY, day_programs, index, seed=seed + day) for day in range(days)]
+        generate_stage.playlists = playlists
+        unfilled = sum(item.duration for playlist in playlists for item in playlist if item.name == PARTIAL_TANDA_NAME)
+        return sum(len(playlist) for playlist in playlists), {"unfilled_seconds": unfilled}
+
+    results["generate"] = measure(generate_stage, repeat)
+    playlists = generate_stage.playlists
+    rows = sum(len(playlist) for playlist in playlists)
+
+    def excel_stage():
+        write_excel_book(((f"Día {day + 1}", playlist) for day, playlist in enumerate(playlists)), io.BytesIO())
+        return rows, {}
+
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        results["export_excel"] = {"skipped": "openpyxl no está instalado"}
+    else:
+        results["export_excel"] = measure(excel_stage, repeat)
+
+    def sheets_stage():
+        for day, playlist in enumerate(playlists):
+            build_sheet_requests(playlist, f"Día {day + 1}", day + 1)
+        return rows, {}
+
+    results["sheets_payload"] = measure(sheets_stage, repeat)
+    shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+# Función para comparar contra una línea base: devuelve las etapas cuyo
+# rendimiento cayó más que el umbral
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    regressions = []
+    for scale, stages in current.items():
+        for stage, result in stages.items():
+            reference = baseline.get(scale, {}).get(stage, {})
+            if reference.get("seconds", 0) < MIN_COMPARABLE_SECONDS:
+                continue
+            before = reference.get("items_per_second")
+            now = result.get("items_per_second")
+            if before and now and now < before * (1 - threshold):
+                regressions.append((scale, stage, before, now))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del generador de playlists")
+    parser.add_argument("--quick", action="store_true", help="Usar solo escalas chicas")
+    parser.add_argument("--sizes", type=int, nargs="+", help="Tamaños de catálogo (promos y rellenos)")
+    parser.add_argument("--days", type=int, nargs="+", help="Cantidad de días a generar")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Pasadas por etapa")
+    parser.add_argument("--save-baseline", help="Guardar los resultados en este JSON")
+    parser.add_argument("--compare", help="Comparar contra esta línea base y fallar si hay regresiones")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Caída tolerada (fracción)")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or (QUICK_CATALOG_SIZES if args.quick else CATALOG_SIZES)
+    day_counts = args.days or (QUICK_DAY_COUNTS if args.quick else DAY_COUNTS)
+
+    results = {}
+    for size in sizes:
+        for days in day_counts:
+            scale = f"catalog={size},days={days}"
+            results[scale] = run_scale(size, days, args.seed, args.repeat)
+            for stage, result in results[scale].items():
+                if "skipped" in result:
+                    print(f"{scale:28} {stage:16} omitida: {result['skipped']}")
+                    continue
+                extra = f"  sin llenar {result['unfilled_seconds']}s" if "unfilled_seconds" in result else ""
+                print(f"{scale:28} {stage:16} {result['items_per_second'] or 0:>14,.0f} elem/s  {result['peak_kib']:>10,.0f} KiB{extra}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results}, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for scale, stage, before, now in regressions:
+            print(f"REGRESIÓN {scale} {stage}: {before:,.0f} -> {now:,.0f} elem/s", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,466 @@
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import closing
+
+from instrumentation import count, span
+from playlist_engine import DEFAULT_GRID, BlockGrid
+
+
+# IDs de las hojas de cálculo de Google Sheets
+PROGRAMS_SPREADSHEET_ID = '1Ka9YhP860lZlibXudUkr7an7zGs-spO54KBmidpNr1A'
+PROMOS_SPREADSHEET_ID = '17AtkM82WEWczbzLvHSq-XYQbiAImTNkmSguDlDg_46g'
+FILLERS_SPREADSHEET_ID = '1MjcPISQEPUvYAHqVtW7nvweqfXhaS_cAbREjeG3uK-I'
+EXPORT_SPREADSHEET_ID = '1SeKSZLR7IWrVVj9ny5hezcS-Nro06Amp9S29W6pMovU'
+
+# Hoja con la grilla de bloques de cada canal (columnas Canal y Minutos).
+# La fila con Canal "*" define la grilla de los canales que no tienen una propia.
+BLOCK_GRID_SPREADSHEET_ID = PROGRAMS_SPREADSHEET_ID
+BLOCK_GRID_WORKSHEET = "Bloques"
+DEFAULT_GRID_CHANNEL = "*"
+
+# Tiempo de vida por defecto de las entradas del catálogo (segundos)
+DEFAULT_CATALOG_TTL = 300
+
+# Ubicación por defecto de la copia local del catálogo
+DEFAULT_SNAPSHOT_PATH = os.path.join(".cache", "catalog.sqlite")
+
+# Clave usada para guardar la lista de hojas de un documento
+WORKSHEETS_KEY = "__worksheets__"
+
+# Marca de las entradas de la caché con los elementos ya convertidos de una hoja
+PARSED_KEY = "parsed"
+
+# Formatos de duración aceptados: HH:MM:SS, MM:SS o segundos
+DURATION_PATTERN = re.compile(r"^(?:(?:(?P<h>\d{1,5}):)?(?P<m>\d{1,7}):)?(?P<s>\d{1,9})(?:\.0*)?$", re.ASCII)
+
+# Formatos de ancho fijo que se convierten en bloque con NumPy:
+# largo del texto -> posiciones de los ":" (HH:MM:SS, H:MM:SS y MM:SS)
+FIXED_DURATION_LAYOUTS = {8: (2, 5), 7: (1, 4), 5: (2,)}
+
+# Máximo de dígitos para una duración dada solo en segundos
+MAX_SECONDS_DIGITS = 9
+
+# Cantidad de filas inválidas que se nombran en el mensaje de error
+MAX_REPORTED_ROWS = 5
+
+# Códigos HTTP de la API de Google que vale la pena reintentar
+RETRYABLE_STATUS = (429, 500, 503)
+
+# Origen por defecto del catálogo y de las exportaciones (ver open_source)
+DEFAULT_CATALOG_SOURCE = "sheets"
+
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+
+# Función para autorizar un cliente de gspread a partir del diccionario de
+# credenciales de la cuenta de servicio
+def authorize_client(credentials_dict):
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    with span("sheets.auth"):
+        credentials = ServiceAccountCredentials.from_json_keyfile_dict(credentials_dict, SCOPE)
+        return gspread.authorize(credentials)
+
+
+# Función para llamar a la API de Google reintentando con espera exponencial
+# cuando se excede la cuota (429) o el servicio falla temporalmente. Cada
+# intento se cuenta como una llamada a la API.
+def call_with_backoff(call, *args, retries=5, base_delay=1.0, **kwargs):
+    for attempt in range(retries + 1):
+        count("api_calls")
+        try:
+            return call(*args, **kwargs)
+        except Exception as e:
+            if getattr(e, "code", None) not in RETRYABLE_STATUS or attempt == retries:
+                raise
+            time.sleep(base_delay * 2 ** attempt + random.uniform(0, base_delay))
+
+
+# Función para abrir el cliente del origen del catálogo y de las exportaciones.
+# Todos los orígenes tienen la misma interfaz que el cliente de gspread:
+#   "sheets": Google Sheets, con `credentials` (credenciales de la cuenta de servicio)
+#   "local:<directorio>": archivos CSV, XLSX o SQLite (ver local_sheets.py)
+#   "fake[:opción=valor,...]": backend en memoria con un catálogo sintético, para
+#       pruebas de carga. Opciones: size, seed, channels (separados por |),
+#       latency, error_rate y quota_per_minute (ver fake_sheets.py)
+def open_source(source, credentials=None):
+    kind, _, argument = source.partition(":")
+    if kind == "sheets":
+        return authorize_client(credentials)
+    if kind == "local":
+        from local_sheets import LocalSheetsClient
+
+        return LocalSheetsClient(argument or ".")
+    if kind == "fake":
+        from fake_sheets import FakeSheetsClient, populate_synthetic
+
+        options = {}
+        for part in filter(None, argument.split(",")):
+            name, equals, value = part.partition("=")
+            if not equals:
+                raise ValueError(f"Opciones desconocidas para el origen fake: {part}")
+            options[name] = value
+        size = int(options.pop("size", 1000))
+        seed = int(options.pop("seed", 0))
+        channels = options.pop("channels", "Canal 1").split("|")
+        quota = options.pop("quota_per_minute", None)
+        client = FakeSheetsClient(
+            latency=float(options.pop("latency", 0)),
+            error_rate=float(options.pop("error_rate", 0)),
+            quota_per_minute=int(quota) if quota else None,
+            seed=seed,
+        )
+        if options:
+            raise ValueError(f"Opciones desconocidas para el origen fake: {', '.join(options)}")
+        return populate_synthetic(client, size, seed, channels)
+    raise ValueError(f"Origen del catálogo desconocido: {source}")
+
+
+# Caché del catálogo compartida entre reruns y sesiones.
+# Las entradas se guardan por (spreadsheet_id, hoja) y expiran después de `ttl` segundos.
+class CatalogCache:
+    def __init__(self, ttl=DEFAULT_CATALOG_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Un candado por clave evita que varias sesiones descarguen la misma hoja a la vez
+        self._key_locks = defaultdict(threading.Lock)
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            return entry
+        return None
+
+    def get(self, key, loader):
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[1]
+            key_lock = self._key_locks[key]
+
+        with key_lock:
+            # Otra sesión pudo haber cargado la clave mientras esperábamos
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry[1]
+                self.misses += 1
+            value = loader()
+            with self._lock:
+                self._entries[key] = (time.monotonic(), value)
+            return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+# Copia local del catálogo en SQLite: guarda los registros de cada hoja junto
+# con la revisión (fecha de modificación en Drive) con la que se descargaron.
+class SnapshotStore:
+    def __init__(self, path=DEFAULT_SNAPSHOT_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                "spreadsheet_id TEXT NOT NULL, worksheet TEXT NOT NULL, "
+                "revision TEXT NOT NULL, records TEXT NOT NULL, fetched_at REAL NOT NULL, "
+                "PRIMARY KEY (spreadsheet_id, worksheet))"
+            )
+
+    # Una conexión por operación para poder usar la copia desde varios hilos
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def load(self, spreadsheet_id, worksheet):
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT revision, records FROM snapshots WHERE spreadsheet_id = ? AND worksheet = ?",
+                (spreadsheet_id, worksheet or ""),
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    # Devuelve el tamaño en bytes de los registros guardados
+    def save(self, spreadsheet_id, worksheet, revision, records):
+        payload = json.dumps(records)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)",
+                (spreadsheet_id, worksheet or "", revision, payload, time.time()),
+            )
+        return len(payload.encode("utf-8"))
+
+
+# Sincronización incremental del catálogo: antes de descargar una hoja se consulta
+# la fecha de modificación del documento en Drive y, si no cambió desde la última
+# descarga, se devuelve la copia local sin llamar a get_all_records().
+class CatalogSync:
+    def __init__(self, client, store):
+        self.client = client
+        self.store = store
+
+    def revision(self, spreadsheet_id):
+        with span("sheets.revision", spreadsheet=spreadsheet_id):
+            metadata = call_with_backoff(self.client.http_client.get_file_drive_metadata, spreadsheet_id)
+            return metadata["modifiedTime"]
+
+    def _sync(self, spreadsheet_id, worksheet, download):
+        revision = self.revision(spreadsheet_id)
+        snapshot = self.store.load(spreadsheet_id, worksheet)
+        if snapshot is not None and snapshot[0] == revision:
+            count("snapshot_hits")
+            return snapshot[1]
+        with span("sheets.download", spreadsheet=spreadsheet_id, worksheet=worksheet) as attrs:
+            records = download()
+            attrs["rows"] = len(records)
+        count("bytes_fetched", self.store.save(spreadsheet_id, worksheet, revision, records))
+        return records
+
+    # Si `worksheet` es None se usa la primera hoja del documento. Son tres
+    # llamadas: metadatos del documento, metadatos de la hoja y valores.
+    def records(self, spreadsheet_id, worksheet=None):
+        def download():
+            spreadsheet = call_with_backoff(self.client.open_by_key, spreadsheet_id)
+            if worksheet:
+                sheet = call_with_backoff(spreadsheet.worksheet, worksheet)
+            else:
+                sheet = call_with_backoff(getattr, spreadsheet, "sheet1")
+            return call_with_backoff(sheet.get_all_records)
+
+        return self._sync(spreadsheet_id, worksheet, download)
+
+    def worksheet_titles(self, spreadsheet_id):
+        def download():
+            spreadsheet = call_with_backoff(self.client.open_by_key, spreadsheet_id)
+            return [sheet.title for sheet in call_with_backoff(spreadsheet.worksheets)]
+
+        return self._sync(spreadsheet_id, WORKSHEETS_KEY, download)
+
+
+# Función para obtener los registros de una hoja, pasando por la caché del catálogo.
+# Si `worksheet` es None se usa la primera hoja del documento.
+def fetch_records(sync, cache, spreadsheet_id, worksheet=None):
+    return cache.get((spreadsheet_id, worksheet), lambda: sync.records(spreadsheet_id, worksheet))
+
+
+# Función para obtener los nombres de las hojas de un documento, pasando por la caché
+def fetch_worksheet_titles(sync, cache, spreadsheet_id):
+    return cache.get((spreadsheet_id, WORKSHEETS_KEY), lambda: sync.worksheet_titles(spreadsheet_id))
+
+
+# --------------------------
+# Cargadores del catálogo
+# --------------------------
+# Los cargadores no dependen de Streamlit: los mensajes para el usuario se
+# agregan a la lista `messages` y el hilo de la interfaz los publica después.
+
+# Función para convertir una duración suelta con la expresión regular.
+# Devuelve None si el formato no es válido.
+def _parse_duration_text(text):
+    match = DURATION_PATTERN.match(text)
+    if match is None:
+        return None
+    hours, minutes, seconds = (int(value) if value else None for value in match.group("h", "m", "s"))
+    if (minutes is not None and seconds >= 60) or (hours is not None and minutes >= 60):
+        return None
+    return (hours or 0) * 3600 + (minutes or 0) * 60 + seconds
+
+
+# Función para convertir una columna de duraciones a segundos enteros de una
+# sola vez. Los segundos sueltos y los formatos de ancho fijo se convierten en
+# bloque con NumPy; solo las filas restantes pasan por la expresión regular.
+# Devuelve los segundos (int64) y una máscara con las filas inválidas.
+def parse_durations(values):
+    # NumPy se importa recién aquí para que importar el módulo (cli.py) siga siendo liviano
+    import numpy as np
+
+    text = np.char.strip(np.array(values, dtype=str))
+    seconds = np.zeros(len(text), dtype=np.int64)
+    invalid = np.ones(len(text), dtype=bool)
+    if not len(text):
+        return seconds, invalid
+    lengths = np.char.str_len(text)
+    # Códigos de cada carácter (el texto de NumPy es UCS-4), sin copiar
+    codes = text.view(np.uint32).reshape(len(text), -1)
+
+    # Solo segundos: los dígitos (ASCII) se acumulan columna por columna
+    digits = codes[:, :MAX_SECONDS_DIGITS].astype(np.int64) - ord("0")
+    inside = np.arange(digits.shape[1]) < lengths[:, None]
+    plain = (lengths > 0) & (lengths <= MAX_SECONDS_DIGITS) & (((digits >= 0) & (digits <= 9)) | ~inside).all(axis=1)
+    number = np.zeros(len(text), dtype=np.int64)
+    for column in range(digits.shape[1]):
+        number = np.where(inside[:, column], number * 10 + digits[:, column], number)
+    seconds[plain] = number[plain]
+    invalid[plain] = False
+
+    # Formatos de ancho fijo: cada texto se ve como una fila de dígitos
+    for width, colons in FIXED_DURATION_LAYOUTS.items():
+        rows = np.flatnonzero(~plain & (lengths == width))
+        if not len(rows):
+            continue
+        chars = codes[rows, :width].astype(np.int64) - ord("0")
+        digit_columns = [column for column in range(width) if column not in colons]
+        valid = (chars[:, list(colons)] == ord(":") - ord("0")).all(axis=1)
+        valid &= ((chars[:, digit_columns] >= 0) & (chars[:, digit_columns] <= 9)).all(axis=1)
+        bounds = (-1, *colons, width)
+        fields = []
+        for start, end in zip(bounds, bounds[1:]):
+            number = np.zeros(len(rows), dtype=np.int64)
+            for column in range(start + 1, end):
+                number = number * 10 + chars[:, column]
+            fields.append(number)
+        *hours, minutes, secs = fields
+        valid &= secs < 60
+        total = minutes * 60 + secs
+        if hours:
+            valid &= minutes < 60
+            total += hours[0] * 3600
+        seconds[rows[valid]] = total[valid]
+        invalid[rows[valid]] = False
+
+    # Formatos poco comunes (y filas inválidas): una por una
+    for row in np.flatnonzero(invalid):
+        value = _parse_duration_text(text[row])
+        if value is not None:
+            seconds[row] = value
+            invalid[row] = False
+    return seconds, invalid
+
+
+# Función para convertir los registros de una hoja (columnas Name y Duration)
+# en elementos con la duración en segundos. Las filas inválidas se descartan
+# y se informan todas juntas en un solo mensaje.
+def parse_catalog(data, kind, messages):
+    if not data:
+        return []
+    # get_all_records convierte en números las celdas numéricas (un programa
+    # llamado "1984"); los nombres se usan siempre como texto
+    names = [str(row['Name']) for row in data]
+    raw = [row['Duration'] for row in data]
+    seconds, invalid = parse_durations(raw)
+    if invalid.any():
+        bad = [f"'{name}' ({duration})" for name, duration, wrong in zip(names, raw, invalid) if wrong]
+        shown = ", ".join(bad[:MAX_REPORTED_ROWS])
+        if len(bad) > MAX_REPORTED_ROWS:
+            shown += f" y {len(bad) - MAX_REPORTED_ROWS} más"
+        messages.append({"type": "error", "content": f"{len(bad)} {kind} con duración inválida (se omiten): {shown}"})
+    return [
+        {'name': name, 'duration': duration}
+        for name, duration, wrong in zip(names, seconds.tolist(), invalid.tolist())
+        if not wrong
+    ]
+
+
+# Función para obtener los elementos ya convertidos de una hoja, pasando por la
+# caché del catálogo: se guardan la lista convertida y los mensajes de las filas
+# inválidas, para no repetir la conversión en cada ejecución de la página.
+def fetch_catalog(sync, cache, spreadsheet_id, worksheet, kind, messages):
+    def load():
+        parse_messages = []
+        items = parse_catalog(sync.records(spreadsheet_id, worksheet), kind, parse_messages)
+        return items, parse_messages
+
+    items, parse_messages = cache.get((spreadsheet_id, worksheet, PARSED_KEY), load)
+    messages.extend(parse_messages)
+    return items
+
+
+# Función para cargar programas
+def load_programs(sync, cache, messages):
+    try:
+        programs = fetch_catalog(sync, cache, PROGRAMS_SPREADSHEET_ID, None, "programas", messages)
+        messages.append({"type": "success", "content": "Programas cargados correctamente"})
+        return programs
+    except Exception as e:
+        messages.append({"type": "error", "content": f"Error al cargar programas: {e}"})
+        return []
+
+
+# Función para cargar promos
+def load_promos(sync, cache, messages):
+    try:
+        promos = fetch_catalog(sync, cache, PROMOS_SPREADSHEET_ID, None, "promos", messages)
+        messages.append({"type": "success", "content": "Promos cargadas correctamente"})
+        return promos
+    except Exception as e:
+        messages.append({"type": "error", "content": f"Error al cargar promos: {e}"})
+        return []
+
+
+# Función para cargar rellenos desde una hoja específica
+def load_fillers(sync, cache, sheet_name, messages):
+    try:
+        fillers = fetch_catalog(sync, cache, FILLERS_SPREADSHEET_ID, sheet_name, f"rellenos de la hoja {sheet_name}", messages)
+        messages.append({"type": "success", "content": f"Rellenos cargados correctamente desde la hoja: {sheet_name}"})
+        return fillers
+    except Exception as e:
+        messages.append({"type": "error", "content": f"Error al cargar rellenos: {e}"})
+        return []
+
+
+# Función para listar las hojas de rellenos disponibles
+def list_sheets(sync, cache, messages):
+    try:
+        return fetch_worksheet_titles(sync, cache, FILLERS_SPREADSHEET_ID)
+    except Exception as e:
+        messages.append({"type": "error", "content": f"Error al listar las hojas: {e}"})
+        return []
+
+
+# Función para cargar la grilla de bloques de cada canal. Si el documento no
+# tiene la hoja de grillas se usa la grilla estándar para todos los canales.
+def load_block_grids(sync, cache, messages):
+    try:
+        if BLOCK_GRID_WORKSHEET not in fetch_worksheet_titles(sync, cache, BLOCK_GRID_SPREADSHEET_ID):
+            return {}
+        data = fetch_records(sync, cache, BLOCK_GRID_SPREADSHEET_ID, BLOCK_GRID_WORKSHEET)
+        grids = {}
+        for row in data:
+            try:
+                minutes = [int(part) for part in re.split(r"[,;\s]+", str(row['Minutos']).strip()) if part]
+                grids[str(row['Canal']).strip()] = BlockGrid(minutes)
+            except ValueError:
+                messages.append({"type": "error", "content": f"Error al procesar la grilla del canal '{row['Canal']}'. Formato inválido: {row['Minutos']}"})
+        return grids
+    except Exception as e:
+        messages.append({"type": "error", "content": f"Error al cargar las grillas de bloques: {e}"})
+        return {}
+
+
+# Función para elegir la grilla de un canal
+def grid_for(grids, channel):
+    return grids.get(channel) or grids.get(DEFAULT_GRID_CHANNEL) or DEFAULT_GRID
+
+
+# Función para ejecutar un cargador midiendo su duración.
+# Devuelve (resultado, mensajes, segundos).
+def timed_load(loader, *args):
+    messages = []
+    started = time.perf_counter()
+    with span(f"catalog.{loader.__name__}"):
+        result = loader(*args, messages)
+    return result, messages, time.perf_counter() - started
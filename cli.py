@@ -0,0 +1,252 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from catalog import (
+    CatalogCache,
+    CatalogSync,
+    DEFAULT_CATALOG_SOURCE,
+    DEFAULT_SNAPSHOT_PATH,
+    SnapshotStore,
+    grid_for,
+    list_sheets,
+    load_block_grids,
+    load_fillers,
+    load_programs,
+    load_promos,
+    open_source,
+    timed_load,
+)
+from instrumentation import configure_json_logs
+from playlist_cache import DEFAULT_PLAYLIST_CACHE_PATH, PlaylistCache, playlist_key
+from playlist_engine import build_catalog_index, clock_seconds, generate, window_length
+
+
+# Punto de entrada sin Streamlit para generar playlists desde la terminal o
+# desde otro programa (por ejemplo, un cron nocturno):
+#   python cli.py generate --channel "Canal 1" --output playlist.xlsx
+#   python cli.py batch --days 7 --channel "Canal 1" --channel "Canal 2"
+#
+# Las credenciales de la cuenta de servicio se buscan, en orden, en --credentials,
+# GOOGLE_APPLICATION_CREDENTIALS (ruta a un JSON) y GOOGLE_SHEETS_CREDENTIALS
+# (el JSON completo). Las variables se pueden definir en un archivo .env.
+# Con --source (o CATALOG_SOURCE) se puede trabajar sin Google, con archivos
+# locales (local:<directorio>) o con el backend falso (fake), y no hacen falta
+# credenciales.
+
+
+class MissingCredentials(Exception):
+    pass
+
+
+class InvalidSource(Exception):
+    pass
+
+
+# Función para leer las credenciales de la cuenta de servicio
+def load_credentials(path=None):
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        pass
+    else:
+        load_dotenv()
+
+    path = path or os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+    if path:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+    raw = os.environ.get("GOOGLE_SHEETS_CREDENTIALS")
+    if raw:
+        return json.loads(raw)
+    raise MissingCredentials("No se encontraron credenciales: usa --credentials, GOOGLE_APPLICATION_CREDENTIALS o GOOGLE_SHEETS_CREDENTIALS")
+
+
+# Función para crear la sincronización y la caché del catálogo
+def open_catalog(credentials_path=None, snapshot_path=DEFAULT_SNAPSHOT_PATH, source=DEFAULT_CATALOG_SOURCE):
+    if source == "sheets":
+        client = open_source(source, load_credentials(credentials_path))
+    else:
+        try:
+            client = open_source(source)
+        except ValueError as e:
+            raise InvalidSource(f"Origen del catálogo inválido ({source}): {e}") from e
+    return CatalogSync(client, SnapshotStore(snapshot_path)), CatalogCache()
+
+
+# Función para mostrar los mensajes de los cargadores en la salida de errores
+def print_messages(messages):
+    for msg in messages:
+        print(f"[{msg['type']}] {msg['content']}", file=sys.stderr)
+
+
+# Función para cargar programas, promos, las grillas de bloques y los rellenos
+# de cada canal en paralelo. Si `channels` está vacío se usan todas las hojas de rellenos.
+def load_catalogs(sync, cache, channels):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        promos_future = pool.submit(timed_load, load_promos, sync, cache)
+        programs_future = pool.submit(timed_load, load_programs, sync, cache)
+        grids_future = pool.submit(timed_load, load_block_grids, sync, cache)
+        if not channels:
+            channels, messages, _ = timed_load(list_sheets, sync, cache)
+            print_messages(messages)
+        filler_futures = {channel: pool.submit(timed_load, load_fillers, sync, cache, channel) for channel in channels}
+
+        promos, messages, _ = promos_future.result()
+        print_messages(messages)
+        programs, messages, _ = programs_future.result()
+        print_messages(messages)
+        grids, messages, _ = grids_future.result()
+        print_messages(messages)
+        fillers = {}
+        for channel, future in filler_futures.items():
+            fillers[channel], messages, _ = future.result()
+            print_messages(messages)
+    return programs, promos, fillers, grids
+
+
+# Función para abrir la caché de playlists (None si está desactivada)
+def open_playlist_cache(path):
+    return PlaylistCache(path) if path else None
+
+
+# Función para generar la playlist de un canal sin interfaz.
+# Devuelve None si falta alguno de los catálogos. Con semilla y caché de
+# playlists, una petición ya generada se devuelve sin volver a generarla.
+def generate_for_channel(sync, cache, channel, start_time, end_time, seed=None, playlist_cache=None):
+    programs, promos, fillers, grids = load_catalogs(sync, cache, [channel])
+    if not programs or not promos or not fillers.get(channel):
+        return None
+    start_clock = clock_seconds(start_time)
+    window_seconds = window_length(start_time, end_time)
+    parsed_programs = [(program["name"], program["duration"]) for program in programs]
+    index = build_catalog_index(promos, fillers[channel])
+    grid = grid_for(grids, channel)
+
+    def run():
+        return generate(start_clock, window_seconds, parsed_programs, index, seed=seed, grid=grid)
+
+    if playlist_cache is None:
+        return run()
+    key = playlist_key(start_clock, window_seconds, parsed_programs, index, grid, seed)
+    return playlist_cache.get_or_generate(key, run)
+
+
+# Función para escribir la playlist según el destino:
+# .xlsx -> Excel, .csv -> CSV, sheets:<título> -> nueva hoja en Google Sheets
+def write_output(playlist, output, sync):
+    if output.startswith("sheets:"):
+        from exporters import write_google_sheet
+        return write_google_sheet(sync.client, playlist, output[len("sheets:"):])
+    if output.endswith(".xlsx"):
+        from exporters import write_excel
+        write_excel(playlist, output)
+        return output
+    from exporters import write_csv
+    with open(output, "w", newline="", encoding="utf-8") as file:
+        write_csv(playlist, file)
+    return output
+
+
+def parse_time(value):
+    return datetime.strptime(value, "%H:%M:%S").time()
+
+
+def run_generate_command(args):
+    sync, cache = open_catalog(args.credentials, args.snapshot, args.source)
+    playlist = generate_for_channel(
+        sync, cache, args.channel, args.start, args.end, seed=args.seed,
+        playlist_cache=open_playlist_cache(args.playlist_cache),
+    )
+    if playlist is None:
+        print("Faltan datos para generar la playlist", file=sys.stderr)
+        return 1
+    for output in args.output:
+        print(write_output(playlist, output, sync))
+    return 0
+
+
+def run_batch_command(args):
+    from batch import plan_jobs, run_batch, write_batch_csv, write_batch_excel
+
+    sync, cache = open_catalog(args.credentials, args.snapshot, args.source)
+    programs, promos, fillers, grids = load_catalogs(sync, cache, args.channel)
+    channels = [channel for channel, items in fillers.items() if items]
+    if not programs or not promos or not channels:
+        print("Faltan datos para generar la playlist", file=sys.stderr)
+        return 1
+
+    start_clock = clock_seconds(args.start)
+    window_seconds = window_length(args.start, args.end)
+    parsed_programs = [(program["name"], program["duration"]) for program in programs]
+    indexes = {channel: build_catalog_index(promos, fillers[channel]) for channel in channels}
+
+    jobs = plan_jobs(args.first_day, args.days, channels, args.seed)
+    channel_grids = {channel: grid_for(grids, channel) for channel in channels}
+    results = run_batch(
+        jobs, parsed_programs, indexes, start_clock, window_seconds, channel_grids,
+        max_workers=args.workers, cache=open_playlist_cache(args.playlist_cache),
+    )
+    if args.excel:
+        write_batch_excel(results, args.excel)
+        print(args.excel)
+        return 0
+    for job, path in write_batch_csv(results, args.output_dir):
+        print(path)
+    return 0
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--credentials", help="Archivo JSON de la cuenta de servicio de Google")
+    common.add_argument(
+        "--source", default=os.environ.get("CATALOG_SOURCE", DEFAULT_CATALOG_SOURCE),
+        help="Origen del catálogo: sheets, local:<directorio> o fake[:opción=valor,...]",
+    )
+    common.add_argument("--snapshot", default=os.environ.get("CATALOG_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH), help="Copia local del catálogo (SQLite)")
+    common.add_argument(
+        "--playlist-cache", default=os.environ.get("PLAYLIST_CACHE_PATH", DEFAULT_PLAYLIST_CACHE_PATH),
+        help="Caché de playlists generadas (SQLite); vacío para desactivarla",
+    )
+    common.add_argument("--start", type=parse_time, default=parse_time("05:59:00"), help="Hora de inicio (HH:MM:SS)")
+    common.add_argument("--end", type=parse_time, default=parse_time("23:59:00"), help="Hora de fin (HH:MM:SS); si es anterior al inicio, la ventana cruza la medianoche")
+
+    parser = argparse.ArgumentParser(description="Gestor de Playlists 24h (sin interfaz)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    single = commands.add_parser("generate", parents=[common], help="Genera la playlist de un canal")
+    single.add_argument("--channel", required=True, help="Hoja de rellenos a usar")
+    single.add_argument("--seed", type=int, default=None, help="Semilla para reproducir la playlist")
+    single.add_argument(
+        "--output", action="append", required=True,
+        help="Destino: archivo .xlsx o .csv, o sheets:<título> (se puede repetir)",
+    )
+    single.set_defaults(handler=run_generate_command)
+
+    batch = commands.add_parser("batch", parents=[common], help="Genera playlists para varios días y canales")
+    batch.add_argument("--channel", action="append", default=[], help="Hoja de rellenos a usar (se puede repetir; por defecto todas)")
+    batch.add_argument("--days", type=int, default=7, help="Cantidad de días a generar")
+    batch.add_argument("--first-day", type=date.fromisoformat, default=date.today(), help="Primer día (AAAA-MM-DD)")
+    batch.add_argument("--seed", type=int, default=0, help="Semilla base del lote")
+    batch.add_argument("--workers", type=int, default=None, help="Cantidad de procesos")
+    batch.add_argument("--output-dir", default="playlists", help="Directorio donde escribir los CSV")
+    batch.add_argument("--excel", help="Escribir todo el lote en este libro .xlsx (una hoja por día y canal)")
+    batch.set_defaults(handler=run_batch_command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    configure_json_logs()
+    try:
+        return args.handler(args)
+    except (MissingCredentials, InvalidSource) as e:
+        print(e, file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
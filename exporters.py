@@ -0,0 +1,200 @@
+import csv
+import random
+import re
+
+from catalog import EXPORT_SPREADSHEET_ID, call_with_backoff
+from instrumentation import span
+from playlist_engine import TYPES, format_clock, format_duration
+
+
+# Encabezados comunes a todas las exportaciones
+PLAYLIST_HEADERS = ['Item', 'Hora de Inicio', 'Nombre', 'Duración', 'Tipo']
+
+
+# Caracteres que Excel no admite en el nombre de una hoja
+INVALID_SHEET_TITLE = re.compile(r"[\[\]:*?/\\]")
+
+# Largo máximo del nombre de una hoja de Excel
+MAX_SHEET_TITLE = 31
+
+
+# Función para armar un nombre de hoja válido de hasta `limit` caracteres que no
+# esté en `used` (Excel no distingue mayúsculas). Si el nombre recortado ya se
+# usó se le agrega ~2, ~3, ... sin pasarse del largo. Agrega el nombre a `used`.
+def sheet_title(title, used, limit=MAX_SHEET_TITLE):
+    base = INVALID_SHEET_TITLE.sub("_", title)[:limit]
+    candidate = base
+    number = 1
+    while candidate.lower() in used:
+        number += 1
+        mark = f"~{number}"
+        candidate = base[:limit - len(mark)] + mark
+    used.add(candidate.lower())
+    return candidate
+
+
+# Función para recorrer las filas de exportación (en el orden de PLAYLIST_HEADERS),
+# formateando cada elemento a medida que se escribe
+def iter_export_rows(playlist):
+    start_clock = playlist.start_clock
+    names = playlist.names
+    columns = zip(playlist.starts, playlist.durations, playlist.name_ids, playlist.type_codes)
+    for index, (start, duration, name_id, code) in enumerate(columns, start=1):
+        yield [index, format_clock(start_clock + start), names[name_id], format_duration(duration), TYPES[code]]
+
+
+# Función para calcular el ancho de cada columna a partir de la playlist tipada,
+# sin formatear las celdas: la hora siempre ocupa 8 caracteres y la duración
+# más larga es la de mayor valor
+def column_widths(playlist):
+    widths = [len(header) for header in PLAYLIST_HEADERS]
+    if len(playlist):
+        widths[0] = max(widths[0], len(str(len(playlist))))
+        widths[1] = max(widths[1], 8)
+        widths[2] = max(widths[2], max(len(str(name)) for name in playlist.names))
+        widths[3] = max(widths[3], len(format_duration(max(playlist.durations))))
+        widths[4] = max(widths[4], max(len(TYPES[code]) for code in set(playlist.type_codes)))
+    return [width + 2 for width in widths]
+
+
+# Función para escribir la playlist como CSV en un archivo de texto abierto
+def write_csv(playlist, file):
+    writer = csv.writer(file)
+    writer.writerow(PLAYLIST_HEADERS)
+    writer.writerows(iter_export_rows(playlist))
+
+
+# Función para escribir un libro de Excel en modo de solo escritura, con una hoja
+# por cada (título, playlist) de `sheets`. Las filas se van escribiendo a medida
+# que se generan, así que `sheets` puede ser un generador (por ejemplo, los
+# resultados de un lote) y solo una playlist está en memoria a la vez.
+# `target` puede ser una ruta o un archivo binario abierto (p. ej. BytesIO).
+def write_excel_book(sheets, target):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    with span("export.excel") as attrs:
+        wb = Workbook(write_only=True)
+        header_font = Font(bold=True, color="FFFFFF")
+        header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
+        attrs["sheets"] = attrs["rows"] = 0
+        used = set()
+        try:
+            for title, playlist in sheets:
+                ws = wb.create_sheet(title=sheet_title(title, used))
+                # En modo de solo escritura los anchos se definen antes de la primera fila
+                for column, width in enumerate(column_widths(playlist), start=1):
+                    ws.column_dimensions[get_column_letter(column)].width = width
+                header = []
+                for value in PLAYLIST_HEADERS:
+                    cell = WriteOnlyCell(ws, value=value)
+                    cell.font = header_font
+                    cell.fill = header_fill
+                    header.append(cell)
+                ws.append(header)
+                for row in iter_export_rows(playlist):
+                    ws.append(row)
+                attrs["sheets"] += 1
+                attrs["rows"] += len(playlist)
+        except BaseException:
+            # Si se interrumpe (por ejemplo, al cancelar un lote) se cierran las
+            # hojas ya empezadas y se borran sus archivos temporales
+            for ws in wb.worksheets:
+                if ws._writer is not None and not ws.closed:
+                    ws.close()
+                    ws._writer.cleanup()
+            raise
+        wb.save(target)
+
+
+# Función para escribir una sola playlist en un libro de Excel
+def write_excel(playlist, target, title="Playlist"):
+    write_excel_book([(title, playlist)], target)
+
+
+# Colores de fondo para cada tipo en Google Sheets
+TYPE_COLORS = {
+    'Program': {'red': 0.8, 'green': 0.8, 'blue': 0.2},  # Amarillo
+    'Tanda': {'red': 0.2, 'green': 0.8, 'blue': 0.2},    # Verde
+    'Promo': {'red': 0.9, 'green': 0.6, 'blue': 0.1},    # Naranja
+    'Filler': {'red': 0.5, 'green': 0.5, 'blue': 0.5},   # Gris
+}
+DEFAULT_COLOR = {'red': 1, 'green': 1, 'blue': 1}
+BOLD_TYPES = ('Program', 'Tanda')
+
+
+def _cell(value):
+    if isinstance(value, int):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": value}}
+
+
+def _row_range(sheet_id, start_row, end_row):
+    return {"sheetId": sheet_id, "startRowIndex": start_row, "endRowIndex": end_row,
+            "startColumnIndex": 0, "endColumnIndex": len(PLAYLIST_HEADERS)}
+
+
+# Función para armar el cuerpo de un único spreadsheets.batchUpdate que crea la
+# hoja con el tamaño exacto, escribe encabezados y valores, y aplica los formatos.
+# Las filas consecutivas del mismo tipo se agrupan en un solo rango de formato.
+def build_sheet_requests(playlist, sheet_title, sheet_id):
+    columns = len(PLAYLIST_HEADERS)
+    rows = [{"values": [_cell(value) for value in PLAYLIST_HEADERS]}]
+    rows.extend({"values": [_cell(value) for value in row]} for row in iter_export_rows(playlist))
+
+    requests = [
+        {"addSheet": {"properties": {
+            "sheetId": sheet_id,
+            "title": sheet_title,
+            "gridProperties": {"rowCount": len(rows), "columnCount": columns, "frozenRowCount": 1},
+        }}},
+        {"updateCells": {
+            "start": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": 0},
+            "rows": rows,
+            "fields": "userEnteredValue",
+        }},
+        # Formato de los encabezados
+        {"repeatCell": {
+            "range": _row_range(sheet_id, 0, 1),
+            "cell": {"userEnteredFormat": {
+                "backgroundColor": {'red': 0.0, 'green': 0.5, 'blue': 0.8},  # Azul claro
+                "textFormat": {"bold": True, "foregroundColor": {'red': 1.0, 'green': 1.0, 'blue': 1.0}},  # Blanco
+            }},
+            "fields": "userEnteredFormat(backgroundColor,textFormat)",
+        }},
+    ]
+
+    # Un rango de formato por cada racha de elementos del mismo tipo
+    codes = playlist.type_codes
+    run_start = 0
+    for i in range(1, len(codes) + 1):
+        if i < len(codes) and codes[i] == codes[run_start]:
+            continue
+        run_type = TYPES[codes[run_start]]
+        requests.append({"repeatCell": {
+            "range": _row_range(sheet_id, run_start + 1, i + 1),
+            "cell": {"userEnteredFormat": {
+                "backgroundColor": TYPE_COLORS.get(run_type, DEFAULT_COLOR),
+                "textFormat": {"bold": run_type in BOLD_TYPES},
+            }},
+            "fields": "userEnteredFormat(backgroundColor,textFormat)",
+        }})
+        run_start = i
+    return {"requests": requests}
+
+
+# Función para exportar a Google Sheets con colores.
+# Crea una hoja nueva en el documento de exportación con una sola llamada a
+# spreadsheets.batchUpdate (reintentando si se excede la cuota) y devuelve su URL.
+# Con un origen local (ver local_sheets.py) devuelve la ruta del archivo escrito.
+def write_google_sheet(client, playlist, sheet_title, spreadsheet_id=EXPORT_SPREADSHEET_ID):
+    with span("export.sheets", rows=len(playlist)) as attrs:
+        sheet_id = random.randrange(1, 2**31 - 1)
+        body = build_sheet_requests(playlist, sheet_title, sheet_id)
+        attrs["requests"] = len(body["requests"])
+        call_with_backoff(client.http_client.batch_update, spreadsheet_id, body)
+    if hasattr(client, "sheet_url"):
+        return f"{client.sheet_url(spreadsheet_id, sheet_id)} -> {sheet_title}"
+    return f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit#gid={sheet_id} -> {sheet_title}"
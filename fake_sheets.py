@@ -0,0 +1,176 @@
+import copy
+import itertools
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+
+# Backend en memoria que imita la parte de gspread que usa la aplicación
+# (open_by_key, sheet1, worksheet, worksheets, get_all_records, batch_update y
+# los metadatos de Drive). Permite probar la carga, la sincronización y las
+# exportaciones sin Google. Cada llamada a la API puede tardar `latency`
+# segundos y fallar con un error de cuota (429) como el servicio real.
+
+class FakeWorksheetNotFound(Exception):
+    pass
+
+
+# Error de la API con el mismo atributo `code` que gspread.exceptions.APIError
+class FakeAPIError(Exception):
+    def __init__(self, code, message):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+
+
+class FakeWorksheet:
+    def __init__(self, client, title, records):
+        self.client = client
+        self.title = title
+        self.records = records
+
+    def get_all_records(self):
+        self.client.api_call("get_all_records")
+        return copy.deepcopy(self.records)
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, spreadsheet_id):
+        self.client = client
+        self.id = spreadsheet_id
+        self.url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}"
+        self._worksheets = []
+        self.modified_time = client.next_revision()
+
+    # Como en gspread, buscar hojas pide los metadatos del documento (una llamada)
+    @property
+    def sheet1(self):
+        self.client.api_call("fetch_sheet_metadata")
+        return self._worksheets[0]
+
+    def worksheet(self, title):
+        self.client.api_call("fetch_sheet_metadata")
+        return self._find(title)
+
+    def _find(self, title):
+        for sheet in self._worksheets:
+            if sheet.title == title:
+                return sheet
+        raise FakeWorksheetNotFound(title)
+
+    def worksheets(self):
+        self.client.api_call("fetch_sheet_metadata")
+        return list(self._worksheets)
+
+
+class FakeHTTPClient:
+    def __init__(self, client):
+        self.client = client
+
+    # Registra el cuerpo recibido y crea las hojas pedidas con addSheet
+    def batch_update(self, spreadsheet_id, body):
+        self.client.api_call("batch_update")
+        self.client.batch_updates.append((spreadsheet_id, body))
+        for request in body.get("requests", []):
+            if "addSheet" in request:
+                title = request["addSheet"]["properties"]["title"]
+                self.client.set_records(spreadsheet_id, title, [])
+        return {"spreadsheetId": spreadsheet_id, "replies": []}
+
+    def get_file_drive_metadata(self, spreadsheet_id):
+        self.client.api_call("drive_metadata")
+        spreadsheet = self.client.spreadsheets[spreadsheet_id]
+        return {"id": spreadsheet_id, "modifiedTime": spreadsheet.modified_time}
+
+
+# Cliente falso.
+#   latency: segundos que tarda cada llamada a la API
+#   error_rate: probabilidad (0..1) de que una llamada falle con 429
+#   quota_per_minute: llamadas permitidas por minuto; las que la exceden fallan con 429
+class FakeSheetsClient:
+    def __init__(self, latency=0.0, error_rate=0.0, quota_per_minute=None, seed=None):
+        self.spreadsheets = {}
+        self.http_client = FakeHTTPClient(self)
+        self.calls = {
+            "open_by_key": 0, "fetch_sheet_metadata": 0, "get_all_records": 0, "drive_metadata": 0, "batch_update": 0,
+        }
+        self.errors = 0
+        self.batch_updates = []
+        self.latency = latency
+        self.error_rate = error_rate
+        self.quota_per_minute = quota_per_minute
+        self._rng = random.Random(seed)
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self._clock = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self._ticks = itertools.count()
+        # Identifica al cliente en sus revisiones, para que la copia local de
+        # otro cliente (otro catálogo sintético) nunca se tome como vigente
+        self._instance = uuid.uuid4().hex[:12]
+
+    # Registra una llamada a la API, simulando la latencia y los errores de cuota
+    def api_call(self, name):
+        with self._lock:
+            self.calls[name] += 1
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            over_quota = self.quota_per_minute is not None and len(self._recent) >= self.quota_per_minute
+            if not over_quota:
+                self._recent.append(now)
+            failed = over_quota or (self.error_rate and self._rng.random() < self.error_rate)
+            if failed:
+                self.errors += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise FakeAPIError(429, "Quota exceeded")
+
+    # Cada modificación avanza el reloj para producir una revisión distinta
+    def next_revision(self):
+        moment = self._clock + timedelta(seconds=next(self._ticks))
+        return f"{moment:%Y-%m-%dT%H:%M:%S}.000Z/{self._instance}"
+
+    def open_by_key(self, spreadsheet_id):
+        self.api_call("open_by_key")
+        return self.spreadsheets[spreadsheet_id]
+
+    # Crea o reemplaza una hoja y marca el documento como modificado
+    def set_records(self, spreadsheet_id, title, records):
+        spreadsheet = self.spreadsheets.get(spreadsheet_id)
+        if spreadsheet is None:
+            spreadsheet = self.spreadsheets[spreadsheet_id] = FakeSpreadsheet(self, spreadsheet_id)
+        try:
+            spreadsheet._find(title).records = records
+        except FakeWorksheetNotFound:
+            spreadsheet._worksheets.append(FakeWorksheet(self, title, records))
+        spreadsheet.modified_time = self.next_revision()
+        return spreadsheet
+
+
+def format_hms(seconds):
+    h, rest = divmod(seconds, 3600)
+    m, s = divmod(rest, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}"
+
+
+# Función para llenar el cliente con un catálogo sintético: 60 programas, `size`
+# promos (de 5 a 90 segundos) y `size` rellenos por canal (de 5 segundos a 5 minutos)
+def populate_synthetic(client, size, seed=0, channels=("Canal 1",)):
+    from catalog import FILLERS_SPREADSHEET_ID, PROGRAMS_SPREADSHEET_ID, PROMOS_SPREADSHEET_ID
+
+    rng = random.Random(seed)
+    client.set_records(PROGRAMS_SPREADSHEET_ID, "Hoja 1", [
+        {"Name": f"Programa {i}", "Duration": format_hms(rng.choice((1320, 1500, 1745, 2700, 3300)))}
+        for i in range(60)
+    ])
+    client.set_records(PROMOS_SPREADSHEET_ID, "Hoja 1", [
+        {"Name": f"Promo {i}", "Duration": format_hms(rng.randint(5, 90))} for i in range(size)
+    ])
+    for channel in channels:
+        client.set_records(FILLERS_SPREADSHEET_ID, channel, [
+            {"Name": f"Relleno {i}", "Duration": format_hms(rng.randint(5, 300))} for i in range(size)
+        ])
+    return client
@@ -0,0 +1,83 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Instrumentación liviana de las rutas críticas: spans con duración, contadores
+# (llamadas a la API, bytes descargados) y, opcionalmente, un log JSON por span
+# para el monitoreo en producción (VJD_JSON_LOGS=1).
+
+logger = logging.getLogger("vjd.perf")
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {}
+        self.counters = {}
+        self.json_logs = False
+
+    # Mide un bloque de código. El diccionario devuelto permite agregar
+    # atributos al span desde adentro del bloque.
+    @contextmanager
+    def span(self, name, **attrs):
+        started = time.perf_counter()
+        error = None
+        try:
+            yield attrs
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self._record(name, time.perf_counter() - started, attrs, error)
+
+    def _record(self, name, seconds, attrs, error):
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = {"calls": 0, "total": 0.0, "max": 0.0, "last": 0.0, "errors": 0}
+            stats["calls"] += 1
+            stats["total"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            stats["last"] = seconds
+            if error:
+                stats["errors"] += 1
+        if self.json_logs:
+            logger.info(json.dumps({"span": name, "ms": round(seconds * 1000, 3), "error": error, **attrs}, default=str))
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "stats": {name: dict(stats) for name, stats in self.stats.items()},
+                "counters": dict(self.counters),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self.counters.clear()
+
+
+# Registro compartido por todo el proceso
+recorder = Recorder()
+span = recorder.span
+count = recorder.count
+
+
+# Función para activar los logs JSON si VJD_JSON_LOGS está definida
+def configure_json_logs():
+    if os.environ.get("VJD_JSON_LOGS", "").lower() not in ("1", "true", "yes"):
+        return
+    recorder.json_logs = True
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
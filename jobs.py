@@ -0,0 +1,117 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import span
+
+
+# Cola de trabajos en segundo plano (generación y exportaciones), independiente
+# de Streamlit. Un pool acotado de hilos es compartido por todas las sesiones; la
+# interfaz consulta el estado y el avance de cada trabajo y recoge el resultado
+# cuando termina, sin bloquear la ejecución del script.
+
+# Cantidad de trabajos que se ejecutan a la vez por defecto
+DEFAULT_JOB_WORKERS = 4
+
+# Cantidad de lotes que usan el pool de procesos a la vez por defecto
+DEFAULT_BATCH_SLOTS = 1
+
+# Estados de un trabajo
+PENDING = "en cola"
+RUNNING = "en curso"
+DONE = "terminado"
+FAILED = "con error"
+CANCELLED = "cancelado"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_id, label):
+        self.id = job_id
+        self.label = label
+        self.status = PENDING
+        self.progress = 0.0
+        self.detail = ""
+        self.result = None
+        self.error = None
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    # Pide la cancelación; el trabajo se detiene en su siguiente aviso de avance
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    # Segundos en cola o en ejecución hasta ahora (o hasta que terminó)
+    @property
+    def elapsed(self):
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.submitted_at
+
+    # Lo llama el trabajo para informar su avance (0..1). Si se pidió la
+    # cancelación lanza JobCancelled para cortar la ejecución.
+    def report(self, progress, detail=None):
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.progress = progress
+        if detail is not None:
+            self.detail = detail
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.label!r}, {self.status})"
+
+
+class JobQueue:
+    def __init__(self, max_workers=DEFAULT_JOB_WORKERS):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="playlist-job")
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._active = set()
+
+    # Encola `fn(job, *args)` y devuelve el Job para seguir su estado
+    def submit(self, label, fn, *args):
+        job = Job(next(self._ids), label)
+        with self._lock:
+            self._active.add(job)
+        self._pool.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job, fn, args):
+        try:
+            if job.cancelled:
+                job.status = CANCELLED
+                return
+            job.status = RUNNING
+            job.started_at = time.monotonic()
+            with span("jobs.run", job=job.label, waited=round(job.started_at - job.submitted_at, 3)):
+                job.result = fn(job, *args)
+            job.progress = 1.0
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = e
+            job.status = FAILED
+        finally:
+            job.finished_at = time.monotonic()
+            with self._lock:
+                self._active.discard(job)
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for job in self._active if job.status == RUNNING)
+            return {"running": running, "pending": len(self._active) - running, "workers": self.max_workers}
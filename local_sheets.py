@@ -0,0 +1,215 @@
+import csv
+import os
+import re
+import sqlite3
+from contextlib import closing
+from datetime import datetime, time, timedelta
+
+from catalog import EXPORT_SPREADSHEET_ID, FILLERS_SPREADSHEET_ID, PROGRAMS_SPREADSHEET_ID, PROMOS_SPREADSHEET_ID
+
+
+# Backend con archivos locales que imita la parte de gspread que usa la
+# aplicación, para trabajar sin Google (en un servidor propio o sin conexión).
+# Cada documento se busca en el directorio por su nombre local, en este orden:
+#   <nombre>.xlsx      un libro; cada hoja del libro es una hoja del documento
+#   <nombre>.sqlite    una base; cada tabla es una hoja (en orden de creación)
+#   <nombre>/          un directorio con un CSV por hoja (en orden alfabético)
+#   <nombre>.csv       un documento de una sola hoja
+# La primera fila (o las columnas de la tabla) son los encabezados. Las
+# exportaciones se escriben como CSV en <nombre del documento de exportación>/.
+
+# Nombre local de cada documento
+DEFAULT_LOCAL_NAMES = {
+    PROGRAMS_SPREADSHEET_ID: "programas",
+    PROMOS_SPREADSHEET_ID: "promos",
+    FILLERS_SPREADSHEET_ID: "rellenos",
+    EXPORT_SPREADSHEET_ID: "exportaciones",
+}
+
+# Caracteres que no pueden ir en el nombre de un archivo
+INVALID_FILENAME = re.compile(r'[\\/:*?"<>|]')
+
+INTEGER = re.compile(r"^-?\d+$")
+DECIMAL = re.compile(r"^-?\d*\.\d+$")
+
+
+class LocalWorksheetNotFound(Exception):
+    pass
+
+
+# Función para convertir los números escritos como texto, como hace gspread
+def _numericise(value):
+    if INTEGER.match(value):
+        return int(value)
+    if DECIMAL.match(value):
+        return float(value)
+    return value
+
+
+# Función para llevar una celda de Excel al valor que devolvería Google Sheets.
+# Las duraciones guardadas como hora o intervalo se escriben como H:MM:SS.
+def _cell_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, time):
+        return value.strftime("%H:%M:%S")
+    if isinstance(value, timedelta):
+        h, rest = divmod(int(value.total_seconds()), 3600)
+        m, s = divmod(rest, 60)
+        return f"{h}:{m:02d}:{s:02d}"
+    return value
+
+
+# Función para armar los registros a partir de los encabezados y las filas,
+# descartando las filas vacías
+def _records(headers, rows):
+    headers = [str(header) for header in headers]
+    return [dict(zip(headers, row)) for row in rows if any(value != "" for value in row)]
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        rows = list(csv.reader(file))
+    if not rows:
+        return []
+    return _records(rows[0], [[_numericise(value) for value in row] for row in rows[1:]])
+
+
+def _read_xlsx(path, title):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = [[_cell_value(value) for value in row] for row in workbook[title].iter_rows(values_only=True)]
+    finally:
+        workbook.close()
+    if not rows:
+        return []
+    return _records(rows[0], rows[1:])
+
+
+def _read_table(path, table):
+    with closing(sqlite3.connect(path)) as conn:
+        cursor = conn.execute(f'SELECT * FROM "{table}"')
+        headers = [column[0] for column in cursor.description]
+        rows = [["" if value is None else value for value in row] for row in cursor]
+    return _records(headers, rows)
+
+
+class LocalWorksheet:
+    def __init__(self, title, read, *args):
+        self.title = title
+        self._read = read
+        self._args = args
+
+    def get_all_records(self):
+        return self._read(*self._args)
+
+
+class LocalSpreadsheet:
+    def __init__(self, spreadsheet_id, path, worksheets):
+        self.id = spreadsheet_id
+        self.url = path
+        self._worksheets = worksheets
+
+    @property
+    def sheet1(self):
+        return self._worksheets[0]
+
+    def worksheet(self, title):
+        for sheet in self._worksheets:
+            if sheet.title == title:
+                return sheet
+        raise LocalWorksheetNotFound(title)
+
+    def worksheets(self):
+        return list(self._worksheets)
+
+
+class LocalHTTPClient:
+    def __init__(self, client):
+        self.client = client
+
+    # Escribe como CSV cada hoja creada con addSheet y llenada con updateCells
+    def batch_update(self, spreadsheet_id, body):
+        titles = {}
+        for request in body.get("requests", []):
+            if "addSheet" in request:
+                properties = request["addSheet"]["properties"]
+                titles[properties["sheetId"]] = properties["title"]
+            elif "updateCells" in request:
+                update = request["updateCells"]
+                sheet_id = update["start"]["sheetId"]
+                rows = [
+                    [next(iter(cell.get("userEnteredValue", {"stringValue": ""}).values())) for cell in row["values"]]
+                    for row in update["rows"]
+                ]
+                self.client.write_sheet(spreadsheet_id, sheet_id, titles[sheet_id], rows)
+        return {"spreadsheetId": spreadsheet_id, "replies": []}
+
+    # La revisión de un documento local es la fecha de modificación de sus archivos
+    def get_file_drive_metadata(self, spreadsheet_id):
+        path = self.client.locate(spreadsheet_id)
+        paths = [path]
+        if os.path.isdir(path):
+            paths += [os.path.join(path, name) for name in os.listdir(path)]
+        return {"id": spreadsheet_id, "modifiedTime": str(max(os.stat(p).st_mtime_ns for p in paths))}
+
+
+# Cliente local.
+#   directory: directorio con los documentos
+#   names: nombre local de cada documento (por defecto, DEFAULT_LOCAL_NAMES)
+class LocalSheetsClient:
+    def __init__(self, directory, names=None):
+        self.directory = directory
+        self.names = dict(DEFAULT_LOCAL_NAMES if names is None else names)
+        self.http_client = LocalHTTPClient(self)
+        self._exported = {}
+
+    def _name(self, spreadsheet_id):
+        return self.names.get(spreadsheet_id, spreadsheet_id)
+
+    # Ruta del archivo o directorio de un documento
+    def locate(self, spreadsheet_id):
+        base = os.path.join(self.directory, self._name(spreadsheet_id))
+        for path in (base + ".xlsx", base + ".sqlite", base + ".db", base, base + ".csv"):
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(f"No se encontró el documento '{self._name(spreadsheet_id)}' en {self.directory}")
+
+    def open_by_key(self, spreadsheet_id):
+        path = self.locate(spreadsheet_id)
+        if os.path.isdir(path):
+            files = sorted(name for name in os.listdir(path) if name.lower().endswith(".csv"))
+            worksheets = [LocalWorksheet(os.path.splitext(name)[0], _read_csv, os.path.join(path, name)) for name in files]
+        elif path.endswith(".xlsx"):
+            from openpyxl import load_workbook
+
+            workbook = load_workbook(path, read_only=True)
+            try:
+                worksheets = [LocalWorksheet(title, _read_xlsx, path, title) for title in workbook.sheetnames]
+            finally:
+                workbook.close()
+        elif path.endswith(".csv"):
+            worksheets = [LocalWorksheet(os.path.splitext(os.path.basename(path))[0], _read_csv, path)]
+        else:
+            with closing(sqlite3.connect(path)) as conn:
+                tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY rowid")]
+            worksheets = [LocalWorksheet(table, _read_table, path, table) for table in tables]
+        return LocalSpreadsheet(spreadsheet_id, path, worksheets)
+
+    # Escribe una hoja exportada como <directorio>/<documento>/<título>.csv
+    def write_sheet(self, spreadsheet_id, sheet_id, title, rows):
+        directory = os.path.join(self.directory, self._name(spreadsheet_id))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, INVALID_FILENAME.sub("_", title) + ".csv")
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            csv.writer(file).writerows(rows)
+        self._exported[(spreadsheet_id, sheet_id)] = path
+        return path
+
+    # Dónde quedó una hoja exportada (en Google Sheets es la URL de la hoja)
+    def sheet_url(self, spreadsheet_id, sheet_id):
+        return self._exported[(spreadsheet_id, sheet_id)]
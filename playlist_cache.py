@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from instrumentation import count, span
+from playlist_engine import Playlist
+
+
+# Caché en disco de playlists generadas, compartida entre sesiones y reinicios.
+# Cada playlist se guarda con una clave que es el hash de todo lo que decide su
+# contenido (programas, catálogo de promos y rellenos, ventana, grilla y semilla),
+# así que una misma petición devuelve la misma playlist sin volver a generarla.
+
+# Ubicación por defecto de la caché de playlists
+DEFAULT_PLAYLIST_CACHE_PATH = os.path.join(".cache", "playlists.sqlite")
+
+# Tamaño máximo por defecto de la caché (bytes); al superarlo se descartan
+# las playlists usadas hace más tiempo
+DEFAULT_PLAYLIST_CACHE_BYTES = 256 * 1024 * 1024
+
+# Versión del formato de la clave: cambiarla invalida las playlists guardadas
+# cuando cambia el motor de generación
+KEY_VERSION = 2
+
+COLUMNS = ("starts", "durations", "type_codes", "name_ids", "blocks")
+
+
+# Función para calcular la clave de una playlist a partir de las entradas de
+# generate(). Sin semilla la generación no es reproducible y no hay clave.
+# `history` es la clave de la playlist anterior cuya rotación continúa (en un
+# lote, el día anterior del mismo canal).
+def playlist_key(start_clock, window_seconds, programs, index, grid, seed, history=None):
+    if seed is None:
+        return None
+    payload = json.dumps(
+        [KEY_VERSION, start_clock, window_seconds, [list(program) for program in programs],
+         index.fingerprint, list(grid.minutes), seed, history],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PlaylistCache:
+    def __init__(self, path=DEFAULT_PLAYLIST_CACHE_PATH, max_bytes=DEFAULT_PLAYLIST_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS playlists ("
+                "key TEXT PRIMARY KEY, start_clock INTEGER NOT NULL, names TEXT NOT NULL, "
+                "starts BLOB NOT NULL, durations BLOB NOT NULL, type_codes BLOB NOT NULL, "
+                "name_ids BLOB NOT NULL, blocks BLOB NOT NULL, "
+                "size INTEGER NOT NULL, used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS playlists_used_at ON playlists (used_at)")
+
+    # Una conexión por operación para poder usar la caché desde varios hilos
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        if key is None:
+            return None
+        with span("playlist_cache.get") as attrs, closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                f"SELECT start_clock, names, {', '.join(COLUMNS)} FROM playlists WHERE key = ?", (key,)
+            ).fetchone()
+            attrs["hit"] = row is not None
+            if row is not None:
+                conn.execute("UPDATE playlists SET used_at = ? WHERE key = ?", (time.time(), key))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        count("playlist_cache_hits" if row is not None else "playlist_cache_misses")
+        if row is None:
+            return None
+        playlist = Playlist(row[0], json.loads(row[1]))
+        for column, data in zip(COLUMNS, row[2:]):
+            getattr(playlist, column).frombytes(data)
+        return playlist
+
+    def put(self, key, playlist):
+        if key is None:
+            return
+        names = json.dumps(playlist.names, ensure_ascii=False)
+        blobs = [getattr(playlist, column).tobytes() for column in COLUMNS]
+        size = len(names.encode("utf-8")) + sum(len(blob) for blob in blobs)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO playlists VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, playlist.start_clock, names, *blobs, size, time.time()),
+            )
+            self._evict(conn)
+
+    # Descarta las playlists usadas hace más tiempo hasta quedar bajo el límite
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM playlists").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM playlists ORDER BY used_at").fetchall():
+            conn.execute("DELETE FROM playlists WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    # Devuelve la playlist guardada o la genera con `generate` y la guarda
+    def get_or_generate(self, key, generate):
+        playlist = self.get(key)
+        if playlist is None:
+            playlist = generate()
+            self.put(key, playlist)
+        return playlist
+
+    def stats(self):
+        with closing(self._connect()) as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM playlists").fetchone()
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
@@ -0,0 +1,846 @@
+import hashlib
+import heapq
+import random
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+from instrumentation import count, span
+
+
+# Motor de programación de la playlist, independiente de Streamlit.
+# Trabaja en segundos enteros desde el inicio de la ventana; el formato a
+# texto (horas, duraciones) se hace solo al mostrar o exportar.
+
+# Tipos de contenido
+PROGRAM = "Program"
+TANDA = "Tanda"
+PROMO = "Promo"
+FILLER = "Filler"
+
+# Código de cada tipo en la representación compacta de la playlist
+TYPES = (PROGRAM, TANDA, PROMO, FILLER)
+TYPE_CODES = {type: code for code, type in enumerate(TYPES)}
+
+# Duración de la tanda fija que acompaña a cada programa (segundos)
+TANDA_SECONDS = 60
+
+# Nombres de la tanda fija y del relleno de los segundos que no se pudieron llenar
+FIXED_TANDA_NAME = "Tanda 60 segundos"
+PARTIAL_TANDA_NAME = "Tanda Parcial"
+
+# Minutos de cada hora en los que comienza un bloque (grilla por defecto)
+BLOCK_START_MINUTES = (0, 10, 15, 20, 30, 40, 45, 50)
+
+SECONDS_PER_DAY = 24 * 3600
+
+# Separación mínima por defecto (segundos) entre dos emisiones de la misma promo o relleno
+DEFAULT_SEPARATION = 30 * 60
+
+
+# Vista de un elemento de la playlist. No se guarda: se arma al recorrer la
+# playlist, que almacena sus datos por columnas.
+class PlaylistItem:
+    __slots__ = ("start", "duration", "name", "type", "block")
+
+    def __init__(self, start, duration, name, type, block):
+        self.start = start
+        self.duration = duration
+        self.name = name
+        self.type = type
+        self.block = block
+
+    def __repr__(self):
+        return f"PlaylistItem({self.start}, {self.duration}, {self.name!r}, {self.type!r}, {self.block})"
+
+
+# Playlist generada, guardada por columnas en arreglos tipados (int32 para
+# inicios, duraciones, bloques e ids de nombre; un byte para el tipo).
+# `start_clock` son los segundos desde la medianoche en que comienza la ventana
+# y cada inicio es relativo a ese punto. Los nombres se guardan una sola vez
+# en `names` y cada elemento apunta a su posición.
+class Playlist:
+    __slots__ = ("start_clock", "names", "starts", "durations", "type_codes", "name_ids", "blocks")
+
+    def __init__(self, start_clock, names=None):
+        self.start_clock = start_clock
+        self.names = names if names is not None else []
+        self.starts = array("i")
+        self.durations = array("i")
+        self.type_codes = array("b")
+        self.name_ids = array("i")
+        self.blocks = array("i")
+
+    def append(self, start, duration, name_id, type, block):
+        self.starts.append(start)
+        self.durations.append(duration)
+        self.type_codes.append(TYPE_CODES[type])
+        self.name_ids.append(name_id)
+        self.blocks.append(block)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        return PlaylistItem(
+            self.starts[i], self.durations[i], self.names[self.name_ids[i]], TYPES[self.type_codes[i]], self.blocks[i]
+        )
+
+    def __iter__(self):
+        names = self.names
+        for start, duration, name_id, code, block in zip(
+            self.starts, self.durations, self.name_ids, self.type_codes, self.blocks
+        ):
+            yield PlaylistItem(start, duration, names[name_id], TYPES[code], block)
+
+    # Copia independiente (para editarla sin tocar la original ni sus vistas)
+    def copy(self):
+        playlist = Playlist(self.start_clock, list(self.names))
+        playlist.starts = array("i", self.starts)
+        playlist.durations = array("i", self.durations)
+        playlist.type_codes = array("b", self.type_codes)
+        playlist.name_ids = array("i", self.name_ids)
+        playlist.blocks = array("i", self.blocks)
+        return playlist
+
+    @property
+    def total_seconds(self):
+        if not self.starts:
+            return 0
+        return self.starts[-1] + self.durations[-1]
+
+    # Columnas como DataFrame de pandas. Los arreglos numéricos se comparten sin
+    # copiarse y el nombre y el tipo son categóricos sobre sus códigos.
+    def to_frame(self):
+        import numpy as np
+        import pandas as pd
+
+        return pd.DataFrame({
+            "start": np.frombuffer(self.starts, dtype=np.int32),
+            "duration": np.frombuffer(self.durations, dtype=np.int32),
+            "name": pd.Categorical.from_codes(np.frombuffer(self.name_ids, dtype=np.int32), categories=self.names),
+            "type": pd.Categorical.from_codes(np.frombuffer(self.type_codes, dtype=np.int8), categories=TYPES),
+            "block": np.frombuffer(self.blocks, dtype=np.int32),
+        }, copy=False)
+
+
+# Función para convertir una hora del día (time o datetime) a segundos desde la medianoche
+def clock_seconds(moment):
+    return moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+# Función para formatear segundos como duración (mismo formato que str(timedelta))
+def format_duration(seconds):
+    h, rest = divmod(seconds, 3600)
+    m, s = divmod(rest, 60)
+    return f"{h}:{m:02d}:{s:02d}"
+
+
+# Función para formatear segundos desde la medianoche como hora del día (HH:MM:SS)
+def format_clock(seconds):
+    h, rest = divmod(seconds % SECONDS_PER_DAY, 3600)
+    m, s = divmod(rest, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}"
+
+
+# Grilla de bloques de un canal: minutos de cada hora en los que comienza un bloque
+class BlockGrid:
+    __slots__ = ("minutes",)
+
+    def __init__(self, minutes=BLOCK_START_MINUTES):
+        minutes = tuple(sorted(set(minutes)))
+        if not minutes or any(not 0 <= minute < 60 for minute in minutes):
+            raise ValueError(f"Grilla de bloques inválida: {minutes}")
+        self.minutes = minutes
+
+    def __eq__(self, other):
+        return isinstance(other, BlockGrid) and self.minutes == other.minutes
+
+    def __hash__(self):
+        return hash(self.minutes)
+
+    def __repr__(self):
+        return f"BlockGrid({self.minutes})"
+
+    # Mayor separación posible entre dos inicios de bloque (segundos)
+    @property
+    def max_gap(self):
+        following = self.minutes[1:] + (self.minutes[0] + 60,)
+        return 60 * max(b - a for a, b in zip(self.minutes, following))
+
+
+DEFAULT_GRID = BlockGrid()
+MAX_BLOCK_GAP = DEFAULT_GRID.max_gap
+
+
+# Inicios de bloque de una ventana, precalculados como segundos desde el inicio
+# de la ventana y ordenados, para buscar el siguiente con bisect. Como se trabaja
+# con segundos absolutos (no con la hora del día), las ventanas que cruzan la
+# medianoche o abarcan varios días no necesitan casos especiales.
+class BlockBoundaries:
+    __slots__ = ("grid", "start_clock", "offsets", "_next_hour")
+
+    def __init__(self, grid, start_clock, window_seconds):
+        self.grid = grid
+        self.start_clock = start_clock
+        self.offsets = []
+        self._next_hour = start_clock // 3600
+        self._extend(window_seconds + grid.max_gap)
+
+    # Agrega los inicios de bloque de cada hora hasta cubrir `until` segundos
+    def _extend(self, until):
+        while not self.offsets or self.offsets[-1] <= until:
+            base = self._next_hour * 3600 - self.start_clock
+            self.offsets.extend(base + minute * 60 for minute in self.grid.minutes if base + minute * 60 > 0)
+            self._next_hour += 1
+
+    # Segundos desde `offset` hasta el siguiente inicio de bloque (estrictamente posterior)
+    def seconds_to_next(self, offset):
+        i = bisect_right(self.offsets, offset)
+        if i == len(self.offsets):
+            self._extend(offset)
+            i = bisect_right(self.offsets, offset)
+        return self.offsets[i] - offset
+
+
+# Función para calcular el largo de una ventana entre dos horas del día; si la
+# hora de fin es anterior (o igual) a la de inicio, la ventana cruza la medianoche
+def window_length(start_time, end_time):
+    seconds = clock_seconds(end_time) - clock_seconds(start_time)
+    return seconds if seconds > 0 else seconds + SECONDS_PER_DAY
+
+
+# Índice del catálogo de promos y rellenos, construido una vez por carga.
+# Cada elemento tiene un id (posición) con su nombre, duración y tipo ya
+# etiquetados; los ids se agrupan por duración y las duraciones se guardan
+# ordenadas para que el llenado las recorra con bisect.
+class CatalogIndex:
+    __slots__ = ("names", "durations", "types", "buckets", "sorted_durations", "counts", "_fingerprint")
+
+    def __init__(self, entries):
+        self.names = []
+        self.durations = []
+        self.types = []
+        self.buckets = {}
+        for name, duration, type in entries:
+            self.buckets.setdefault(duration, []).append(len(self.names))
+            self.names.append(name)
+            self.durations.append(duration)
+            self.types.append(type)
+        self.sorted_durations = sorted(self.buckets)
+        # Firma (duración, cantidad) que identifica la versión del catálogo para el llenado
+        self.counts = tuple((duration, len(self.buckets[duration])) for duration in self.sorted_durations)
+        self._fingerprint = None
+
+    def __len__(self):
+        return len(self.names)
+
+    # Hash del contenido del índice (se calcula una sola vez), usado como
+    # versión del catálogo en la caché de playlists
+    @property
+    def fingerprint(self):
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for name, duration, type in zip(self.names, self.durations, self.types):
+                digest.update(f"{name}\x1f{duration}\x1f{type}\x1e".encode("utf-8"))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+
+# Función para construir el índice a partir de las promos y rellenos cargados
+def build_catalog_index(promos, fillers):
+    entries = [(promo["name"], promo["duration"], PROMO) for promo in promos]
+    entries += [(filler["name"], filler["duration"], FILLER) for filler in fillers]
+    return CatalogIndex(entries)
+
+
+# Tabla de llenado de tandas (subset-sum acotado sobre segundos enteros).
+# Se memoiza por (`counts`, `limit`, `order_seed`): `counts` es la firma
+# (duración, cantidad) del índice del catálogo y `order_seed` sale del RNG de
+# cada generación, así que la tabla solo se reutiliza al repetir la semilla.
+# Devuelve `best`, donde best[t] es el mayor total alcanzable <= t, y `parent`,
+# la duración usada para alcanzar cada total. El orden en que se prueban las
+# duraciones se baraja con `order_seed`, lo que decide los desempates.
+@lru_cache(maxsize=32)
+def _fill_table(counts, limit, order_seed):
+    order = counts[:bisect_right(counts, (limit, float("inf")))]
+    order = [entry for entry in order if entry[0] > 0]
+    random.Random(order_seed).shuffle(order)
+    reach = bytearray(limit + 1)
+    reach[0] = 1
+    parent = [0] * (limit + 1)
+    for duration, count in order:
+        used = [0] * (limit + 1)
+        for t in range(duration, limit + 1):
+            if not reach[t] and reach[t - duration] and used[t - duration] < count:
+                reach[t] = 1
+                used[t] = used[t - duration] + 1
+                parent[t] = duration
+    best = [0] * (limit + 1)
+    for t in range(1, limit + 1):
+        best[t] = t if reach[t] else best[t - 1]
+    return best, parent
+
+
+# Función para buscar duraciones que sumen exactamente `target` usando como
+# máximo `cantidad` elementos de cada (duración, cantidad) de `counts`. Es el mismo
+# subset-sum acotado de _fill_table, pero con enteros como conjuntos de bits para
+# poder rehacerlo por tanda; las cantidades se parten en potencias de dos. Se
+# prefieren las primeras duraciones de `counts`. Devuelve la lista o None.
+def _exact_plan(counts, target):
+    mask = (1 << (target + 1)) - 1
+    pieces = []
+    for duration, available in counts:
+        available = min(available, target // duration)
+        size = 1
+        while available > 0:
+            copies = min(size, available)
+            pieces.append((duration, copies))
+            available -= copies
+            size *= 2
+    stages = []
+    reach = 1
+    for duration, copies in pieces:
+        stages.append(reach)
+        reach |= (reach << duration * copies) & mask
+    if not reach >> target & 1:
+        return None
+    plan = []
+    for (duration, copies), previous in zip(reversed(pieces), reversed(stages)):
+        if not previous >> target & 1:
+            plan.extend([duration] * copies)
+            target -= duration * copies
+    return plan
+
+
+# Cantidad de duraciones (las que hace más tiempo no salen) con las que se
+# intenta primero armar cada tanda, antes de probar con todas
+STALEST_DURATIONS = 16
+
+
+# Rotación de promos y rellenos: recuerda cuándo salió al aire cada elemento y
+# cuántas veces, para repartir las emisiones en vez de repetir siempre los mismos.
+# Cada duración del catálogo tiene un heap ordenado por (última emisión, usos),
+# así que tomar el elemento que hace más tiempo no sale es O(log n). Los que
+# salieron hace menos de `separation` segundos esperan en otro heap ordenado por
+# el momento en que vuelven a estar disponibles, y se lleva la cuenta de cuántos
+# hay disponibles por duración sin recorrer el catálogo. Los tiempos son
+# absolutos (`origin` + segundos desde el inicio de la playlist), para que la
+# rotación siga de un día al siguiente.
+#   state: (últimas emisiones, usos) devuelto por state() en una rotación anterior
+class Rotation:
+    def __init__(self, index, separation=DEFAULT_SEPARATION, rng=None, state=None, origin=0):
+        self.index = index
+        self.separation = separation
+        self.origin = origin
+        self.rng = rng if rng is not None else random.Random()
+        if state is None:
+            self.last_aired = [float("-inf")] * len(index)
+            self.uses = [0] * len(index)
+        else:
+            self.last_aired, self.uses = list(state[0]), list(state[1])
+        # Emisiones que no pudieron respetar la separación
+        self.conflicts = 0
+        self._heaps = None
+        self._ties = None
+        self._keys = None
+        self._clock = None
+
+    # Copia del estado, para seguir la rotación en otra playlist (u otro proceso)
+    def state(self):
+        return list(self.last_aired), list(self.uses)
+
+    # Los heaps se arman recién al elegir, así que una rotación que solo
+    # registra emisiones (observe) no los construye
+    def _ensure_heaps(self):
+        if self._heaps is None:
+            if self._ties is None:
+                random_tie = self.rng.random
+                self._ties = [random_tie() for _ in range(len(self.index))]
+            last_aired, uses, ties = self.last_aired, self.uses, self._ties
+            self._heaps = {}
+            for duration, ids in self.index.buckets.items():
+                heap = [(last_aired[i], uses[i], ties[i], i) for i in ids]
+                heapq.heapify(heap)
+                self._heaps[duration] = heap
+            self._clock = None
+        return self._heaps
+
+    # Pone al día los disponibles por duración para el instante absoluto `at`.
+    # Si el tiempo retrocede (al editar una playlist) se recalculan desde cero.
+    def _advance(self, at):
+        if self._clock is None or at < self._clock:
+            latest = at - self.separation
+            self._available = {duration: len(ids) for duration, ids in self.index.buckets.items()}
+            self._cooling = [
+                (last + self.separation, item_id) for item_id, last in enumerate(self.last_aired) if last > latest
+            ]
+            for _, item_id in self._cooling:
+                self._available[self.index.durations[item_id]] -= 1
+            heapq.heapify(self._cooling)
+            self._stale = [(self._heaps[duration][0][:2], duration) for duration, available in self._available.items() if available]
+            heapq.heapify(self._stale)
+        cooling = self._cooling
+        while cooling and cooling[0][0] <= at:
+            release, item_id = heapq.heappop(cooling)
+            # Las entradas de un elemento que volvió a salir después se descartan
+            if release == self.last_aired[item_id] + self.separation:
+                duration = self.index.durations[item_id]
+                self._available[duration] += 1
+                if self._available[duration] == 1:
+                    self._mark(duration)
+        self._clock = at
+
+    # Agrega la duración al heap de duraciones ordenado por su elemento más
+    # antiguo. Las entradas viejas no se borran: se descartan al sacarlas.
+    def _mark(self, duration):
+        heapq.heappush(self._stale, (self._heaps[duration][0][:2], duration))
+
+    # Las duraciones disponibles (hasta `target` segundos) cuyo elemento más
+    # antiguo hace más tiempo que no sale, como (duración, disponibles)
+    def _stalest(self, target, limit):
+        stale = self._stale
+        found = []
+        valid = []
+        seen = set()
+        while stale and len(found) < limit:
+            key, duration = heapq.heappop(stale)
+            if duration in seen or not self._available[duration] or self._heaps[duration][0][:2] != key:
+                continue
+            seen.add(duration)
+            valid.append((key, duration))
+            if 0 < duration <= target:
+                found.append((duration, self._available[duration]))
+        for entry in valid:
+            heapq.heappush(stale, entry)
+        return found
+
+    # Registra las emisiones de una playlist ya armada (por ejemplo, el día
+    # anterior de un lote o una playlist que se va a editar)
+    def observe(self, playlist, origin=0):
+        if self._keys is None:
+            self._keys = {}
+            for item_id, entry in enumerate(zip(self.index.names, self.index.durations, self.index.types)):
+                self._keys.setdefault(entry, item_id)
+        names = playlist.names
+        columns = zip(playlist.starts, playlist.durations, playlist.name_ids, playlist.type_codes)
+        for start, duration, name_id, code in columns:
+            item_id = self._keys.get((names[name_id], duration, TYPES[code]))
+            if item_id is not None:
+                self.last_aired[item_id] = max(self.last_aired[item_id], origin + start)
+                self.uses[item_id] += 1
+        self._heaps = None
+
+    # Duraciones que suman exactamente `target` usando solo elementos disponibles
+    # en `now`, prefiriendo las duraciones cuyo elemento más antiguo hace más
+    # tiempo que no sale. Devuelve None si no hay combinación.
+    def plan(self, target, now):
+        self._ensure_heaps()
+        self._advance(self.origin + now)
+        stalest = self._stalest(target, STALEST_DURATIONS)
+        plan = _exact_plan(stalest, target)
+        if plan is None and len(stalest) == STALEST_DURATIONS:
+            plan = _exact_plan(self._stalest(target, len(self._available)), target)
+        return plan
+
+    # Toma, para cada duración del plan, el elemento que hace más tiempo no sale;
+    # los que violan la separación se cuentan como conflictos
+    def take(self, plan, now):
+        heaps = self._ensure_heaps()
+        taken = [heapq.heappop(heaps[duration])[3] for duration in plan]
+        latest = self.origin + now - self.separation
+        late = sum(1 for item_id in taken if self.last_aired[item_id] > latest)
+        if late:
+            self.conflicts += late
+            count("rotation_conflicts", late)
+        return taken
+
+    # Registra la emisión de los elementos tomados, en orden, a partir de `now`
+    def air(self, selected, now):
+        heaps = self._ensure_heaps()
+        self._advance(self.origin + now)
+        at = self.origin + now
+        for item_id in selected:
+            duration = self.index.durations[item_id]
+            if self.last_aired[item_id] + self.separation <= self._clock:
+                self._available[duration] -= 1
+            self.last_aired[item_id] = at
+            self.uses[item_id] += 1
+            heapq.heappush(heaps[duration], (at, self.uses[item_id], self._ties[item_id], item_id))
+            heapq.heappush(self._cooling, (at + self.separation, item_id))
+            if self._available[duration]:
+                self._mark(duration)
+            at += duration
+
+
+# Selector de contenido para las tandas: llena cada tanda con la combinación de
+# promos y rellenos que más se acerca (o iguala) a los segundos disponibles.
+# La combinación de duraciones sale de la tabla de llenado (memoizada por
+# catálogo y semilla) y fija cuántos segundos se llenan; la rotación busca la
+# combinación que llena lo mismo con los elementos que hace más tiempo no
+# salen. Si no la hay respetando la separación se usa la de la tabla: nunca se
+# resignan segundos por la rotación.
+class BreakFiller:
+    def __init__(self, index, limit=MAX_BLOCK_GAP, rng=None, rotation=None):
+        self.index = index
+        self.rng = rng if rng is not None else random.Random()
+        self.order_seed = self.rng.getrandbits(32)
+        self.rotation = rotation if rotation is not None else Rotation(index, rng=self.rng)
+        self.limit = 0
+        self._plans = {}
+        self._ensure(limit)
+
+    def _ensure(self, limit):
+        if limit > self.limit:
+            self.limit = limit
+            self._best, self._parent = _fill_table(self.index.counts, limit, self.order_seed)
+            self._plans.clear()
+
+    # Duraciones que forman el mejor llenado para `seconds` (memoizado)
+    def plan(self, seconds):
+        plan = self._plans.get(seconds)
+        if plan is None:
+            self._ensure(seconds)
+            plan = []
+            t = self._best[seconds]
+            while t > 0:
+                duration = self._parent[t]
+                plan.append(duration)
+                t -= duration
+            self._plans[seconds] = plan
+        return plan
+
+    # Devuelve los ids elegidos para una tanda que empieza `now` segundos después
+    # del inicio de la playlist y los segundos que quedaron sin llenar
+    def select(self, seconds, now=0):
+        plan = self.plan(seconds)
+        filled = sum(plan)
+        if filled:
+            plan = self.rotation.plan(filled, now) or plan
+        selected = self.rotation.take(plan, now)
+        self.rng.shuffle(selected)
+        self.rotation.air(selected, now)
+        return selected, seconds - sum(plan)
+
+
+# Función para generar la playlist.
+#   start_clock: segundos desde la medianoche en que empieza la ventana
+#   window_seconds: largo de la ventana en segundos
+#   programs: lista de (nombre, duración en segundos)
+#   index: CatalogIndex con las promos y rellenos
+#   grid: BlockGrid del canal (por defecto, la grilla estándar)
+#   progress: función opcional que recibe el avance (0..1); se llama como
+#             máximo una vez por bloque y solo cuando cambia el porcentaje
+#   rotation: Rotation con la que sigue la rotación de promos y rellenos (por
+#             ejemplo, la del día anterior); por defecto empieza de cero
+def generate(start_clock, window_seconds, programs, index, progress=None, seed=None, grid=DEFAULT_GRID, rotation=None):
+    with span("engine.generate", window_seconds=window_seconds, catalog=len(index)) as attrs:
+        rng = random.Random(seed)
+        filler = BreakFiller(index, limit=grid.max_gap, rng=rng, rotation=rotation)
+        playlist = _generate(start_clock, window_seconds, programs, filler, progress, grid)
+        attrs["items"] = len(playlist)
+        attrs["rotation_conflicts"] = filler.rotation.conflicts
+    return playlist
+
+
+def _generate(start_clock, window_seconds, programs, filler, progress, grid):
+    index = filler.index
+    boundaries = BlockBoundaries(grid, start_clock, window_seconds)
+    playlist = Playlist(start_clock)
+    name_ids = {}
+    block = 1
+    now = 0
+    last_percent = -1
+
+    def add(duration, name, type):
+        nonlocal now
+        name_id = name_ids.get(name)
+        if name_id is None:
+            name_id = name_ids[name] = len(playlist.names)
+            playlist.names.append(name)
+        playlist.append(now, duration, name_id, type, block)
+        now += duration
+
+    def report():
+        nonlocal last_percent
+        if progress is None or window_seconds <= 0:
+            return
+        percent = min(now * 100 // window_seconds, 100)
+        if percent != last_percent:
+            last_percent = percent
+            progress(percent / 100)
+
+    # Tanda de 60 segundos al inicio
+    add(TANDA_SECONDS, FIXED_TANDA_NAME, TANDA)
+
+    for name, duration in programs:
+        if now >= window_seconds:
+            break
+        add(duration, name, PROGRAM)
+
+        # Tanda de 60 segundos después del programa
+        add(TANDA_SECONDS, FIXED_TANDA_NAME, TANDA)
+
+        # Llenar hasta el siguiente bloque con promos y rellenos
+        remaining = boundaries.seconds_to_next(now)
+        if remaining > 0:
+            selected, unfilled = filler.select(remaining, now)
+            for item_id in selected:
+                add(index.durations[item_id], index.names[item_id], index.types[item_id])
+            if unfilled > 0:
+                add(unfilled, PARTIAL_TANDA_NAME, TANDA)
+
+        report()
+        block += 1
+
+    if progress is not None:
+        progress(1.0)
+    return playlist
+
+
+# Edición incremental de una playlist generada. Cada bloque es el programa, la
+# tanda fija y la tanda de promos y rellenos que llega hasta el siguiente inicio
+# de bloque (el bloque 1 empieza además con la tanda inicial). Al editar solo se
+# vuelve a planificar desde el bloque afectado: los bloques siguientes se corren
+# y se detiene en cuanto un bloque vuelve a empezar donde empezaba. Las tandas
+# que siguen teniendo el mismo espacio conservan su contenido; las demás se
+# rearman conservando los elementos que caben y llenando el resto. El elemento
+# editado siempre se conserva: si no cabe en su tanda, la tanda se alarga hasta
+# el siguiente inicio de bloque y los bloques siguientes se corren.
+#   playlist: se modifica en el lugar (usar playlist.copy() para conservar la original)
+#   index, grid, seed: los mismos usados para generarla
+#   window_seconds: largo de la ventana; los bloques que quedan fuera se quitan
+#   programs: lista de (nombre, duración) usada al generarla; si la playlist
+#             queda corta se agregan bloques con los programas que siguen
+#   next_program: posición en `programs` del siguiente programa a agregar (por
+#             defecto, la cantidad de programas de la playlist recién generada)
+class PlaylistEditor:
+    def __init__(self, playlist, index, window_seconds, grid=DEFAULT_GRID, seed=None, programs=None, next_program=None):
+        self.playlist = playlist
+        self.index = index
+        self.window_seconds = window_seconds
+        self.programs = programs or []
+        if next_program is None:
+            next_program = playlist.type_codes.count(TYPE_CODES[PROGRAM])
+        self.next_program = next_program
+        self.boundaries = BlockBoundaries(grid, playlist.start_clock, window_seconds)
+        self.filler = BreakFiller(index, limit=grid.max_gap, rng=random.Random(seed))
+        # Las tandas rearmadas siguen la rotación de lo que ya tiene la playlist
+        self.filler.rotation.observe(playlist)
+        self._name_ids = {name: name_id for name_id, name in enumerate(playlist.names)}
+        # Bloques vueltos a planificar en la última edición
+        self.replanned = 0
+
+    def _intern(self, name):
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self.playlist.names)
+            self.playlist.names.append(name)
+        return name_id
+
+    # Posiciones [inicio, fin) de los elementos de un bloque
+    def _block_span(self, block):
+        blocks = self.playlist.blocks
+        return bisect_left(blocks, block), bisect_right(blocks, block)
+
+    # Posición del programa dentro de un bloque (None si el bloque no tiene programa)
+    def _program_position(self, first, stop):
+        program = TYPE_CODES[PROGRAM]
+        for position in range(first, stop):
+            if self.playlist.type_codes[position] == program:
+                return position
+        return None
+
+    def _last_block(self):
+        return self.playlist.blocks[-1] if len(self.playlist) else 0
+
+    # Posiciones [inicio, fin) de la tanda de promos y rellenos de un bloque, después
+    # del programa y de la tanda fija (que no se pueden quitar ni separar)
+    def _break_span(self, block):
+        first, stop = self._block_span(block)
+        program = self._program_position(first, stop)
+        return (stop if program is None else program + 2), stop
+
+    # Reemplaza los elementos [i, j) por `rows` (duración, id de nombre, código de tipo)
+    def _splice(self, i, j, rows, block):
+        p = self.playlist
+        p.starts[i:j] = array("i", [0] * len(rows))
+        p.durations[i:j] = array("i", [duration for duration, _, _ in rows])
+        p.name_ids[i:j] = array("i", [name_id for _, name_id, _ in rows])
+        p.type_codes[i:j] = array("b", [code for _, _, code in rows])
+        p.blocks[i:j] = array("i", [block] * len(rows))
+
+    def _renumber(self, position, delta):
+        blocks = self.playlist.blocks
+        for i in range(position, len(blocks)):
+            blocks[i] += delta
+
+    # Arma de nuevo la tanda [start, stop) para que ocupe `available` segundos.
+    # Se conservan, en su orden, los elementos que caben (primero `pinned`, el
+    # elemento recién editado) y el resto se llena como al generar a partir de
+    # `now`, el horario en que empieza la tanda.
+    def _plan_break(self, start, stop, available, pinned, now):
+        p = self.playlist
+        partial = self._name_ids.get(PARTIAL_TANDA_NAME)
+        candidates = [i for i in range(start, stop) if i != pinned and p.name_ids[i] != partial]
+        if pinned is not None and start <= pinned < stop:
+            candidates.insert(0, pinned)
+        budget = available
+        kept = set()
+        for i in candidates:
+            if p.durations[i] <= budget:
+                kept.add(i)
+                budget -= p.durations[i]
+        rows = [(p.durations[i], p.name_ids[i], p.type_codes[i]) for i in range(start, stop) if i in kept]
+        if budget > 0:
+            index = self.index
+            selected, unfilled = self.filler.select(budget, now + available - budget)
+            rows.extend(
+                (index.durations[item_id], self._intern(index.names[item_id]), TYPE_CODES[index.types[item_id]])
+                for item_id in selected
+            )
+            if unfilled > 0:
+                rows.append((unfilled, self._intern(PARTIAL_TANDA_NAME), TYPE_CODES[TANDA]))
+        return rows
+
+    # Vuelve a calcular los horarios desde `block`, rearmando las tandas que lo necesitan
+    def _relayout(self, block, pinned=None):
+        p = self.playlist
+        first, _ = self._block_span(block)
+        cursor = p.starts[first - 1] + p.durations[first - 1] if first > 0 else 0
+        dirty = True
+        while block <= self._last_block():
+            first, stop = self._block_span(block)
+            if not dirty and p.starts[first] == cursor:
+                break
+            program = self._program_position(first, stop)
+            if program is None:
+                break
+            self.replanned += 1
+            for i in range(first, program + 2):
+                p.starts[i] = cursor
+                cursor += p.durations[i]
+            start = program + 2
+            available = self.boundaries.seconds_to_next(cursor)
+            if pinned is not None and start <= pinned < stop and p.durations[pinned] > available:
+                end = cursor + p.durations[pinned]
+                available = end - cursor + self.boundaries.seconds_to_next(end)
+            if sum(p.durations[start:stop]) != available:
+                rows = self._plan_break(start, stop, available, pinned, cursor)
+                self._splice(start, stop, rows, block)
+                stop = start + len(rows)
+            for i in range(start, stop):
+                p.starts[i] = cursor
+                cursor += p.durations[i]
+            dirty = False
+            pinned = None
+            block += 1
+        self._trim()
+        self._fill_window()
+
+    # Quita los bloques cuyo programa empieza fuera de la ventana
+    def _trim(self):
+        p = self.playlist
+        while len(p):
+            first, stop = self._block_span(self._last_block())
+            program = self._program_position(first, stop)
+            if program is None or p.starts[program] < self.window_seconds:
+                break
+            self._splice(program, stop, [], 0)
+
+    # Agrega bloques con los programas que siguen hasta cubrir la ventana, como al generar
+    def _fill_window(self):
+        p = self.playlist
+        cursor = p.total_seconds
+        while cursor < self.window_seconds and self.next_program < len(self.programs):
+            name, duration = self.programs[self.next_program]
+            self.next_program += 1
+            self.replanned += 1
+            fixed = (TANDA_SECONDS, self._intern(FIXED_TANDA_NAME), TYPE_CODES[TANDA])
+            rows = [fixed] if not len(p) else []
+            rows += [(duration, self._intern(name), TYPE_CODES[PROGRAM]), fixed]
+            now = cursor + sum(row[0] for row in rows)
+            position = len(p)
+            rows += self._plan_break(position, position, self.boundaries.seconds_to_next(now), None, now)
+            self._splice(position, position, rows, self._last_block() + 1)
+            for i in range(position, len(p)):
+                p.starts[i] = cursor
+                cursor += p.durations[i]
+
+    def _edit(self, op, block, pinned=None):
+        with span("engine.replan", op=op, block=block) as attrs:
+            self.replanned = 0
+            self._relayout(block, pinned)
+            attrs["blocks"] = self.replanned
+
+    # Cambia el programa de un bloque
+    def replace_program(self, block, name, duration):
+        p = self.playlist
+        program = self._program_position(*self._block_span(block))
+        if program is None:
+            raise IndexError(f"No existe el bloque {block}")
+        p.name_ids[program] = self._intern(name)
+        p.durations[program] = duration
+        self._edit("replace_program", block)
+
+    # Agrega un bloque con el programa antes del bloque `block` (al final si
+    # `block` es posterior al último y queda lugar en la ventana)
+    def insert_program(self, block, name, duration):
+        p = self.playlist
+        block = min(block, self._last_block() + 1)
+        if block > self._last_block() and p.total_seconds >= self.window_seconds:
+            raise IndexError("La playlist ya cubre la ventana: no hay lugar para otro bloque al final")
+        first, stop = self._block_span(block)
+        position = self._program_position(first, stop) if first < stop else len(p)
+        self._renumber(position, 1)
+        rows = [
+            (duration, self._intern(name), TYPE_CODES[PROGRAM]),
+            (TANDA_SECONDS, self._intern(FIXED_TANDA_NAME), TYPE_CODES[TANDA]),
+        ]
+        self._splice(position, position, rows, block)
+        self._edit("insert_program", block)
+
+    # Quita un bloque completo (programa, tanda fija y tanda de promos)
+    def remove_program(self, block):
+        first, stop = self._block_span(block)
+        program = self._program_position(first, stop)
+        if program is None:
+            raise IndexError(f"No existe el bloque {block}")
+        self._splice(program, stop, [], block)
+        self._renumber(program, -1)
+        self._edit("remove_program", block)
+
+    # Cambia el nombre o la duración de un elemento (posición desde 0). Si es
+    # parte de una tanda, se conserva y la tanda se rearma alrededor de él.
+    def update_item(self, position, name=None, duration=None):
+        p = self.playlist
+        if name is not None:
+            p.name_ids[position] = self._intern(name)
+        if duration is not None:
+            p.durations[position] = duration
+        self._edit("update_item", p.blocks[position], pinned=position)
+
+    # Quita un elemento; si es un programa se quita el bloque completo. Las
+    # tandas fijas no se pueden quitar.
+    def remove_item(self, position):
+        p = self.playlist
+        block = p.blocks[position]
+        if p.type_codes[position] == TYPE_CODES[PROGRAM]:
+            self.remove_program(block)
+            return
+        start, stop = self._break_span(block)
+        if not start <= position < stop:
+            raise IndexError(f"El ítem {position + 1} es una tanda fija del bloque {block} y no se puede quitar")
+        self._splice(position, position + 1, [], block)
+        self._edit("remove_item", block)
+
+    # Agrega un elemento del catálogo (o cualquier otro) en la posición dada
+    # dentro de una tanda (o al final de ella); la tanda se rearma conservándolo
+    def insert_item(self, position, name, duration, type=PROMO):
+        p = self.playlist
+        block = p.blocks[position - 1] if position > 0 else 1
+        start, stop = self._break_span(block)
+        if not start <= position <= stop:
+            raise IndexError(f"La posición {position + 1} no está dentro de una tanda de promos y rellenos")
+        self._splice(position, position, [(duration, self._intern(name), TYPE_CODES[type])], block)
+        self._edit("insert_item", block, pinned=position)
@@ -1,21 +1,53 @@
 import streamlit as st
-import gspread
-from datetime import datetime, timedelta
-from oauth2client.service_account import ServiceAccountCredentials
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill
-import random
+from datetime import datetime
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 
-
-# Configuración inicial de la página (debe ser la primera llamada)
-st.set_page_config(
-    page_title="Gestor de Playlists 24h",
-    page_icon="🎧",
-    layout="wide",
-    initial_sidebar_state="expanded"
+from catalog import (
+    CatalogCache,
+    CatalogSync,
+    DEFAULT_CATALOG_SOURCE,
+    DEFAULT_CATALOG_TTL,
+    DEFAULT_SNAPSHOT_PATH,
+    SnapshotStore,
+    grid_for,
+    list_sheets,
+    load_block_grids,
+    load_fillers,
+    load_programs,
+    load_promos,
+    open_source,
+    parse_durations,
+    timed_load,
+)
+from batch import plan_jobs, run_batch, write_batch_excel
+from exporters import write_excel, write_google_sheet
+from instrumentation import configure_json_logs, recorder, span
+from jobs import CANCELLED, DEFAULT_BATCH_SLOTS, DEFAULT_JOB_WORKERS, FAILED, JobQueue
+from playlist_cache import DEFAULT_PLAYLIST_CACHE_BYTES, DEFAULT_PLAYLIST_CACHE_PATH, PlaylistCache, playlist_key
+from playlist_engine import (
+    PlaylistEditor,
+    build_catalog_index,
+    clock_seconds,
+    format_clock,
+    format_duration,
+    generate,
+    window_length,
 )
 
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Filas por página disponibles en la vista previa
+PREVIEW_PAGE_SIZES = (50, 100, 250, 500)
+
+# Cada cuántos segundos se actualiza el panel de trabajos en segundo plano
+JOB_POLL_SECONDS = 1
+
+
 # --------------------------
 # 1. Configuración del Tema
 # --------------------------
@@ -62,349 +94,476 @@ def check_login():
         st.stop()  # Detener la ejecución si no se ha iniciado sesión
 
 
+# Cliente del origen del catálogo compartido por todo el proceso (se autoriza una
+# sola vez). CATALOG_SOURCE elige el origen: Google Sheets (por defecto), archivos
+# locales o el backend falso (ver catalog.open_source).
+# Si la autenticación falla se lanza la excepción para que no quede en caché.
+@st.cache_resource(show_spinner=False)
+def get_sheets_client():
+    source = os.environ.get("CATALOG_SOURCE", DEFAULT_CATALOG_SOURCE)
+    if source == "sheets":
+        # Obtener credenciales desde st.secrets
+        return open_source(source, dict(st.secrets["google_sheets"]))
+    return open_source(source)
+
+
+# Caché del catálogo compartida entre reruns y sesiones
+@st.cache_resource(show_spinner=False)
+def get_catalog_cache():
+    ttl = int(os.environ.get("CATALOG_TTL_SECONDS", DEFAULT_CATALOG_TTL))
+    return CatalogCache(ttl=ttl)
+
+
+# Sincronización incremental del catálogo contra la copia local en disco
+@st.cache_resource(show_spinner=False)
+def get_catalog_sync():
+    path = os.environ.get("CATALOG_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+    return CatalogSync(get_sheets_client(), SnapshotStore(path))
+
+
+# Caché en disco de playlists generadas, compartida entre sesiones y reinicios
+@st.cache_resource(show_spinner=False)
+def get_playlist_cache():
+    path = os.environ.get("PLAYLIST_CACHE_PATH", DEFAULT_PLAYLIST_CACHE_PATH)
+    max_bytes = int(os.environ.get("PLAYLIST_CACHE_BYTES", DEFAULT_PLAYLIST_CACHE_BYTES))
+    return PlaylistCache(path, max_bytes=max_bytes)
+
+
 # Función para autenticar Google Sheets usando Streamlit Secrets
 def authenticate_google_sheets():
     try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        
-        # Obtener credenciales desde st.secrets
-        credentials_dict = st.secrets["google_sheets"]
-        
-        # Crear credenciales desde el diccionario
-        credentials = ServiceAccountCredentials.from_json_keyfile_dict(credentials_dict, scope)
-        client = gspread.authorize(credentials)
-        
-        return client
+        return get_sheets_client()
     except Exception as e:
         st.error(f"Error al autenticar Google Sheets: {e}")
         return None
 
 
-# Función para cargar programas desde Google Sheets
-def load_programs_from_google_sheet():
-    client = authenticate_google_sheets()
-    if not client:
-        return []
-    try:
-        spreadsheet_id = '1Ka9YhP860lZlibXudUkr7an7zGs-spO54KBmidpNr1A'
-        spreadsheet = client.open_by_key(spreadsheet_id)
-        worksheet = spreadsheet.sheet1
-        data = worksheet.get_all_records()
-        programs = [{'name': row['Name'], 'duration': row['Duration']} for row in data]
-        st.session_state.messages.append({"type": "success", "content": "Programas cargados correctamente"})
-        return programs
-    except Exception as e:
-        st.session_state.messages.append({"type": "error", "content": f"Error al cargar programas: {e}"})
-        return []
+# Pool de hilos compartido para cargar el catálogo en paralelo
+@st.cache_resource(show_spinner=False)
+def get_loader_pool():
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="catalog-loader")
 
-# Función para cargar promos desde Google Sheets
-def load_promos_from_google_sheet():
-    client = authenticate_google_sheets()
-    if not client:
-        return []
-    try:
-        spreadsheet_id = '17AtkM82WEWczbzLvHSq-XYQbiAImTNkmSguDlDg_46g'
-        spreadsheet = client.open_by_key(spreadsheet_id)
-        worksheet = spreadsheet.sheet1
-        data = worksheet.get_all_records()
-        promos = []
-        for row in data:
-            try:
-                h, m, s = map(int, row['Duration'].split(':'))
-                duration_seconds = h * 3600 + m * 60 + s
-                promos.append({'name': row['Name'], 'duration': duration_seconds})
-            except ValueError:
-                st.session_state.messages.append({"type": "error", "content": f"Error al procesar la duración de la promo '{row['Name']}'. Formato inválido: {row['Duration']}"})
-        st.session_state.messages.append({"type": "success", "content": "Promos cargadas correctamente"})
-        return promos
-    except Exception as e:
-        st.session_state.messages.append({"type": "error", "content": f"Error al cargar promos: {e}"})
-        return []
 
-# Función para cargar rellenos desde una hoja específica de Google Sheets
-def load_fillers_from_google_sheet(sheet_name):
-    client = authenticate_google_sheets()
-    if not client:
-        return []
-    try:
-        spreadsheet_id = '1MjcPISQEPUvYAHqVtW7nvweqfXhaS_cAbREjeG3uK-I'
-        spreadsheet = client.open_by_key(spreadsheet_id)
-        worksheet = spreadsheet.worksheet(sheet_name)  # Seleccionar la hoja por nombre
-        data = worksheet.get_all_records()
-        fillers = []
-        for row in data:
-            try:
-                h, m, s = map(int, row['Duration'].split(':'))
-                duration_seconds = h * 3600 + m * 60 + s
-                fillers.append({'name': row['Name'], 'duration': duration_seconds})
-            except ValueError:
-                st.session_state.messages.append({"type": "error", "content": f"Error al procesar la duración del relleno '{row['Name']}'. Formato inválido: {row['Duration']}"})
-        st.session_state.messages.append({"type": "success", "content": f"Rellenos cargados correctamente desde la hoja: {sheet_name}"})
-        return fillers
-    except Exception as e:
-        st.session_state.messages.append({"type": "error", "content": f"Error al cargar rellenos: {e}"})
+# Función para recoger el resultado de un cargador: publica sus mensajes
+# en la sesión y registra el tiempo que tardó la fuente
+def collect_load(future, source):
+    if future is None:
         return []
+    result, messages, elapsed = future.result()
+    st.session_state.messages.extend(messages)
+    st.session_state.load_timings[source] = elapsed
+    return result
 
-# Función para listar las hojas disponibles en el Google Sheet
-def list_sheets():
-    client = authenticate_google_sheets()
-    if not client:
-        return []
+# --------------------------
+# Trabajos en segundo plano
+# --------------------------
+# La generación y las exportaciones se encolan en un pool de hilos compartido
+# por todas las sesiones. Las funciones que corren en el pool no usan Streamlit:
+# reciben el Job para informar su avance y devuelven el resultado, que la sesión
+# recoge en `apply_job` cuando el trabajo termina.
+
+# Cola de trabajos compartida entre sesiones
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    return JobQueue(max_workers=int(os.environ.get("PLAYLIST_JOB_WORKERS", DEFAULT_JOB_WORKERS)))
+
+
+# Lotes que pueden usar procesos a la vez, entre todas las sesiones. Cada lote
+# abre su propio pool de hasta min(núcleos, canales) procesos; los demás esperan.
+@st.cache_resource(show_spinner=False)
+def get_batch_slots():
+    return threading.BoundedSemaphore(int(os.environ.get("PLAYLIST_BATCH_SLOTS", DEFAULT_BATCH_SLOTS)))
+
+
+# Función para encolar un trabajo de la sesión. `kind` decide cómo se aplica
+# el resultado y `context` guarda los datos que necesita esa aplicación.
+def submit_job(kind, label, fn, *args, **context):
+    job = get_job_queue().submit(label, fn, *args)
+    st.session_state.jobs.append({"kind": kind, "job": job, "context": context})
+    return job
+
+
+# Función para saber si la sesión tiene un trabajo de este tipo sin terminar
+def job_running(kind):
+    return any(entry["kind"] == kind and not entry["job"].finished for entry in st.session_state.jobs)
+
+
+# Trabajo: escribir la playlist como libro de Excel en memoria
+def excel_job(job, playlist):
+    job.report(0.0, "Escribiendo Excel...")
+    buffer = io.BytesIO()
+    write_excel(playlist, buffer)
+    return buffer.getvalue()
+
+
+# Trabajo: exportar la playlist a una hoja nueva de Google Sheets
+def sheets_job(job, client, playlist, sheet_title):
+    job.report(0.0, "Enviando a Google Sheets...")
+    return write_google_sheet(client, playlist, sheet_title)
+
+
+# Trabajo: generar la playlist. Si la misma petición ya se generó (en esta u
+# otra sesión) se toma de la caché. Devuelve (playlist, si vino de la caché).
+def generate_job(job, start_clock, window_seconds, programs, catalog_index, grid, seed, playlist_cache):
+    key = playlist_key(start_clock, window_seconds, programs, catalog_index, grid, seed)
+    playlist = playlist_cache.get(key)
+    if playlist is not None:
+        return playlist, True
+
+    def report(progress):
+        job.report(progress, f"Generando playlist... {int(progress * 100)}% completado")
+
+    playlist = generate(start_clock, window_seconds, programs, catalog_index, progress=report, seed=seed, grid=grid)
+    playlist_cache.put(key, playlist)
+    return playlist, False
+
+
+# Trabajo: generar un lote en el pool de procesos y escribirlo en un libro de
+# Excel. Antes espera un lugar en `slots` (se puede cancelar mientras espera).
+def batch_job(job, slots, batch_jobs, programs, indexes, start_clock, window_seconds, grids, playlist_cache):
+    def tracked(results):
+        for done, result in enumerate(results, start=1):
+            job.report(done / len(batch_jobs), f"Generando lote... {done}/{len(batch_jobs)} playlists")
+            yield result
+
+    while not slots.acquire(timeout=0.5):
+        job.report(0.0, "Esperando a que terminen otros lotes...")
     try:
-        spreadsheet_id = '1MjcPISQEPUvYAHqVtW7nvweqfXhaS_cAbREjeG3uK-I'
-        spreadsheet = client.open_by_key(spreadsheet_id)
-        sheets = [sheet.title for sheet in spreadsheet.worksheets()]
-        return sheets
-    except Exception as e:
-        st.session_state.messages.append({"type": "error", "content": f"Error al listar las hojas: {e}"})
-        return []
+        results = run_batch(batch_jobs, programs, indexes, start_clock, window_seconds, grids, cache=playlist_cache)
+        buffer = io.BytesIO()
+        write_batch_excel(tracked(results), buffer)
+        return buffer.getvalue()
+    finally:
+        slots.release()
 
-# Función para exportar a Excel
+
+# Función para exportar a Excel: el libro se escribe en segundo plano y se
+# ofrece para descargar con st.download_button cuando está listo
 def export_to_excel(playlist):
-    try:
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Playlist"
-        headers = ['Item', 'Hora de Inicio', 'Nombre', 'Duración', 'Tipo']
-        ws.append(headers)
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-        for col in ws.iter_cols(min_row=1, max_row=1, min_col=1, max_col=len(headers)):
-            for cell in col:
-                cell.font = header_font
-                cell.fill = header_fill
-        for i, block in enumerate(playlist, start=1):
-            ws.append([block['item'], block['start_time'], block['name'], block['duration'], block['type']])
-        for column in ws.columns:
-            max_length = max(len(str(cell.value)) for cell in column)
-            ws.column_dimensions[column[0].column_letter].width = max_length + 2
-        filename = f"playlist_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.xlsx"
-        wb.save(filename)
-        st.session_state.messages.append({"type": "success", "content": f"Playlist exportada correctamente a: {filename}"})
-    except Exception as e:
-        st.session_state.messages.append({"type": "error", "content": f"Error al exportar a Excel: {e}"})
+    filename = f"playlist_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.xlsx"
+    st.session_state.excel_export = None
+    submit_job("excel", "Exportar a Excel", excel_job, playlist, filename=filename)
 
 # Función para exportar a Google Sheets con colores
 def export_to_google_sheets(playlist, sheet_title):
-    try:
-        client = authenticate_google_sheets()
-        if not client:
-            return
-        spreadsheet_id = '1SeKSZLR7IWrVVj9ny5hezcS-Nro06Amp9S29W6pMovU'  # Reemplaza con tu ID
-        spreadsheet = client.open_by_key(spreadsheet_id)
-
-        # Crear una nueva hoja dentro del Google Sheet
-        worksheet = spreadsheet.add_worksheet(title=sheet_title, rows="100", cols="5")
-
-        # Escribir los encabezados en la primera fila
-        headers = ['Item', 'Hora de Inicio', 'Nombre', 'Duración', 'Tipo']
-        worksheet.update(values=[headers], range_name='A1:E1')
-
-        # Definir colores para cada tipo
-        type_colors = {
-            'Program': {'red': 0.8, 'green': 0.8, 'blue': 0.2},  # Amarillo
-            'Tanda': {'red': 0.2, 'green': 0.8, 'blue': 0.2},    # Verde
-            'Promo': {'red': 0.9, 'green': 0.6, 'blue': 0.1},    # Naranja
-            'Filler': {'red': 0.5, 'green': 0.5, 'blue': 0.5},   # Gris
-        }
-
-        # Crear las filas de datos
-        rows = []
-        formats = []
-        for i, block in enumerate(playlist, start=2):  # Comenzar desde la fila 2
-            rows.append([
-                block['item'],  # Número de ítem
-                block['start_time'],
-                block['name'],
-                block['duration'],
-                block['type']
-            ])
-            # Aplicar formato de color según el tipo
-            row_range = f'A{i}:E{i}'
-            formats.append({
-                "range": row_range,
-                "format": {
-                    "backgroundColor": type_colors.get(block['type'], {'red': 1, 'green': 1, 'blue': 1}),
-                    "textFormat": {"bold": block['type'] in ['Program', 'Tanda']}
-                }
-            })
+    client = authenticate_google_sheets()
+    if not client:
+        return
+    submit_job("sheets", f"Exportar a Google Sheets ({sheet_title})", sheets_job, client, playlist, sheet_title)
+
+
+# Índice de promos y rellenos, construido una vez por cada catálogo cargado
+@st.cache_resource(show_spinner=False, max_entries=16)
+def get_catalog_index(promos, fillers):
+    return build_catalog_index(promos, fillers)
+
+
+# Función para encolar la generación de la playlist
+def generate_playlist(start_time, end_time, catalog_index, user_programs, grid, seed):
+    start_clock = clock_seconds(start_time)
+    window_seconds = window_length(start_time, end_time)
+    programs = [(program["name"], program["duration"]) for program in user_programs]
+    submit_job(
+        "generate", "Generar playlist", generate_job,
+        start_clock, window_seconds, programs, catalog_index, grid, seed, get_playlist_cache(),
+        index=catalog_index, window_seconds=window_seconds, grid=grid, seed=seed, programs=programs,
+    )
+
+# Función para encolar un lote de playlists (días x canales); el lote se
+# reparte en un pool de procesos desde el trabajo en segundo plano
+def generate_batch(first_day, days, channels, seed, start_time, end_time, promos, user_programs, grids):
+    catalog_sync = get_catalog_sync()
+    catalog_cache = get_catalog_cache()
+    loader_pool = get_loader_pool()
+    fillers_futures = {
+        channel: loader_pool.submit(timed_load, load_fillers, catalog_sync, catalog_cache, channel)
+        for channel in channels
+    }
+    indexes = {}
+    for channel, future in fillers_futures.items():
+        channel_fillers = collect_load(future, f"Rellenos {channel}")
+        if channel_fillers:
+            indexes[channel] = get_catalog_index(promos, channel_fillers)
+    if not indexes:
+        st.session_state.messages.append({"type": "warning", "content": "Faltan datos para generar el lote"})
+        return
+
+    start_clock = clock_seconds(start_time)
+    window_seconds = window_length(start_time, end_time)
+    programs = [(program["name"], program["duration"]) for program in user_programs]
+    channel_grids = {channel: grid_for(grids, channel) for channel in indexes}
+    batch_jobs = plan_jobs(first_day, days, list(indexes), seed)
+    submit_job(
+        "batch", f"Lote de {len(batch_jobs)} playlists", batch_job,
+        get_batch_slots(), batch_jobs, programs, indexes, start_clock, window_seconds, channel_grids, get_playlist_cache(),
+        filename=f"lote_{first_day.isoformat()}_{days}d.xlsx", count=len(batch_jobs),
+    )
+
+
+# Función para aplicar a la sesión el resultado de un trabajo terminado
+def apply_job(entry):
+    job, context = entry["job"], entry["context"]
+    if job.status == CANCELLED:
+        st.session_state.messages.append({"type": "warning", "content": f"{job.label}: cancelado"})
+        return
+    if job.status == FAILED:
+        st.session_state.messages.append({"type": "error", "content": f"{job.label}: {job.error}"})
+        return
+
+    kind = entry["kind"]
+    if kind == "generate":
+        playlist, cached = job.result
+        st.session_state.playlist = playlist
+        st.session_state.playlist_context = context
+        st.session_state.playlist_edits = 0
+        st.session_state.excel_export = None
+        content = "Playlist recuperada de la caché ⚡" if cached else "Playlist generada correctamente"
+        st.session_state.messages.append({"type": "success", "content": content})
+    elif kind == "batch":
+        st.session_state.batch_export = job.result
+        st.session_state.batch_export_name = context["filename"]
+        st.session_state.messages.append({"type": "success", "content": f"Lote generado: {context['count']} playlists"})
+    elif kind == "excel":
+        st.session_state.excel_export = job.result
+        st.session_state.excel_export_name = context["filename"]
+        st.session_state.messages.append({"type": "success", "content": f"Playlist exportada correctamente a: {context['filename']}"})
+    elif kind == "sheets":
+        st.session_state.messages.append({"type": "success", "content": f"Playlist exportada correctamente a Google Sheets: {job.result}"})
+
+
+# Panel de trabajos de la sesión. Se vuelve a ejecutar solo (sin el resto de la
+# página) para mostrar el avance; cuando un trabajo termina aplica su resultado
+# y recarga la página completa.
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_jobs():
+    entries = st.session_state.jobs
+    finished = [entry for entry in entries if entry["job"].finished]
+    for entry in finished:
+        entries.remove(entry)
+        apply_job(entry)
+    if finished:
+        st.rerun()
+
+    for entry in entries:
+        job = entry["job"]
+        col_job, col_cancel = st.columns([4, 1])
+        with col_job:
+            st.progress(job.progress, text=f"{job.label} · {job.detail or job.status} · {job.elapsed:.0f}s")
+        with col_cancel:
+            if st.button("✖️ Cancelar", key=f"cancel_job_{job.id}", disabled=job.cancelled, use_container_width=True):
+                job.cancel()
+
+
+# Función para obtener la tabla de la vista previa: se arma una sola vez por
+# playlist generada (sobre los arreglos de la playlist, sin copiarlos) y se
+# reutiliza en las siguientes ejecuciones
+def get_preview_frame(playlist):
+    cached = st.session_state.get("preview_frame")
+    if cached is None or cached[0] is not playlist:
+        with span("ui.preview_frame", rows=len(playlist)):
+            cached = st.session_state.preview_frame = (playlist, playlist.to_frame())
+    return cached[1]
+
+
+# Función para dar formato de texto a la página visible de la vista previa
+def format_preview_page(page, start_clock):
+    return pd.DataFrame({
+        "item": page.index + 1,
+        "start_time": [format_clock(start_clock + int(start)) for start in page["start"]],
+        "name": page["name"].astype(str),
+        "duration": [format_duration(int(duration)) for duration in page["duration"]],
+        "type": page["type"].astype(str),
+        "block": page["block"],
+    })
 
-        # Escribir las filas en una sola llamada
-        worksheet.update(values=rows, range_name=f'A2:E{len(rows) + 1}')
 
-        # Aplicar los formatos en un solo lote
-        worksheet.batch_format(formats)
+# Función para obtener la tabla de programas del sidebar; solo se reconstruye
+# cuando cambia la lista cargada
+def get_programs_frame(programs):
+    cached = st.session_state.get("programs_frame")
+    if cached is None or cached[0] != programs:
+        frame = pd.DataFrame(programs, columns=["name", "duration"])
+        frame["duration"] = frame["duration"].map(format_duration)
+        cached = st.session_state.programs_frame = (programs, frame)
+    return cached[1]
+
+
+# Marcas del filtro de horario: el inicio de la ventana, cada hora en punto y el final
+def preview_time_marks(playlist):
+    total = playlist.total_seconds
+    first_hour = -playlist.start_clock % 3600
+    return sorted({0, total, *range(first_hour, total, 3600)})
+
+
+# Función para mostrar la vista previa filtrada por bloque, tipo y horario.
+# Los filtros y la paginación se aplican en el servidor y al navegador solo
+# se envía la página visible.
+def show_preview(playlist):
+    frame = get_preview_frame(playlist)
+
+    col_filter1, col_filter2, col_filter3 = st.columns(3)
+    with col_filter1:
+        blocks = st.multiselect("Bloques", frame["block"].unique().tolist(), placeholder="Todos")
+    with col_filter2:
+        types = st.multiselect("Tipos", frame["type"].unique().tolist(), placeholder="Todos")
+    with col_filter3:
+        marks = preview_time_marks(playlist)
+        time_from, time_to = st.select_slider(
+            "Horario",
+            options=marks,
+            value=(marks[0], marks[-1]),
+            format_func=lambda offset: format_clock(playlist.start_clock + offset),
+        )
 
-        # Aplicar formato a los encabezados
-        worksheet.format('A1:E1', {
-            'backgroundColor': {'red': 0.0, 'green': 0.5, 'blue': 0.8},  # Azul claro
-            'textFormat': {'bold': True, 'foregroundColor': {'red': 1.0, 'green': 1.0, 'blue': 1.0}}  # Blanco
-        })
+    mask = (frame["start"] >= time_from) & (frame["start"] < max(time_to, time_from + 1))
+    if blocks:
+        mask &= frame["block"].isin(blocks)
+    if types:
+        mask &= frame["type"].isin(types)
+    filtered = frame[mask]
+
+    col_page1, col_page2, col_page3 = st.columns([1, 1, 2])
+    with col_page1:
+        page_size = st.selectbox("Filas por página", PREVIEW_PAGE_SIZES, index=1)
+    pages = max(1, -(-len(filtered) // page_size))
+    # Si los filtros reducen la cantidad de páginas, volver a la última disponible
+    if st.session_state.get("preview_page", 1) > pages:
+        st.session_state.preview_page = pages
+    with col_page2:
+        page = st.number_input(f"Página (de {pages})", min_value=1, max_value=pages, key="preview_page")
+    with col_page3:
+        st.markdown("<div style='height:28px'></div>", unsafe_allow_html=True)  # Espaciado
+        st.caption(f"{len(filtered)} de {len(frame)} elementos")
+
+    start = (page - 1) * page_size
+    visible = format_preview_page(filtered.iloc[start:start + page_size], playlist.start_clock)
+    with span("ui.preview", rows=len(visible)):
+        st.dataframe(
+            visible,
+            column_config={
+                "item": "Ítem",
+                "start_time": {"label": "Hora Inicio", "help": "Hora de inicio del bloque"},
+                "name": "Contenido",
+                "duration": "Duración",
+                "type": {"label": "Tipo", "help": "Tipo de contenido (Programa, Tanda, etc.)"},
+                "block": "Bloque",
+            },
+            use_container_width=True,
+            hide_index=True
+        )
+
+
+# Función para aplicar una edición sobre la playlist de la sesión. Solo se
+# vuelven a planificar los bloques afectados; se trabaja sobre una copia porque
+# la tabla de la vista previa comparte los arreglos de la playlist actual.
+def edit_playlist(action, *args):
+    context = st.session_state.playlist_context
+    playlist = st.session_state.playlist.copy()
+    edits = st.session_state.playlist_edits = st.session_state.get("playlist_edits", 0) + 1
+    seed = None if context["seed"] is None else f"{context['seed']}:{edits}"
+    editor = PlaylistEditor(
+        playlist, context["index"], context["window_seconds"], grid=context["grid"], seed=seed,
+        programs=context.get("programs"), next_program=context.get("next_program"),
+    )
+    try:
+        getattr(editor, action)(*args)
+    except IndexError as e:
+        st.session_state.messages.append({"type": "error", "content": str(e)})
+    else:
+        st.session_state.playlist = playlist
+        # Los bloques agregados al final siguen con los programas no usados
+        st.session_state.playlist_context = {**context, "next_program": editor.next_program}
+        st.session_state.excel_export = None
+        st.session_state.messages.append(
+            {"type": "success", "content": f"Playlist actualizada: {editor.replanned} bloques replanificados"}
+        )
+    # La vista previa ya se dibujó con la playlist anterior
+    st.rerun()
+
+
+# Función para mostrar los controles de edición de la playlist
+def show_editor(playlist, programs):
+    with st.expander("✏️ Editar playlist"):
+        last_block = playlist.blocks[-1] if len(playlist) else 1
+        # Solo se puede agregar un bloque al final si la playlist no cubre la ventana
+        window_full = playlist.total_seconds >= st.session_state.playlist_context["window_seconds"]
+        max_block = last_block if window_full else last_block + 1
+        col_block1, col_block2, col_block3 = st.columns(3)
+        with col_block1:
+            block = st.number_input("Bloque", min_value=1, max_value=max_block, value=1)
+        with col_block2:
+            names = [program["name"] for program in programs]
+            name = st.selectbox("Programa", names, disabled=not names)
+        with col_block3:
+            st.markdown("<div style='height:28px'></div>", unsafe_allow_html=True)  # Espaciado
+            program = next((program for program in programs if program["name"] == name), None)
+            if st.button("🔁 Cambiar programa", disabled=program is None or block > last_block):
+                edit_playlist("replace_program", int(block), program["name"], program["duration"])
+            if st.button("➕ Insertar antes", disabled=program is None):
+                edit_playlist("insert_program", int(block), program["name"], program["duration"])
+            if st.button("🗑️ Quitar bloque", disabled=block > last_block):
+                edit_playlist("remove_program", int(block))
+
+        col_item1, col_item2, col_item3 = st.columns(3)
+        with col_item1:
+            item = st.number_input("Ítem", min_value=1, max_value=max(1, len(playlist)), value=1)
+        with col_item2:
+            duration = st.text_input("Nueva duración", placeholder="HH:MM:SS")
+        with col_item3:
+            st.markdown("<div style='height:28px'></div>", unsafe_allow_html=True)  # Espaciado
+            if st.button("⏱️ Cambiar duración", disabled=not duration):
+                seconds, invalid = parse_durations([duration])
+                if invalid[0] or not seconds[0]:
+                    st.session_state.messages.append({"type": "error", "content": f"Duración inválida: {duration}"})
+                else:
+                    edit_playlist("update_item", int(item) - 1, None, int(seconds[0]))
+            if st.button("🗑️ Quitar ítem", disabled=not len(playlist)):
+                edit_playlist("remove_item", int(item) - 1)
+
+
+# Función para mostrar los tiempos registrados por la instrumentación
+def show_performance():
+    snapshot = recorder.snapshot()
+    counters = snapshot["counters"]
+    st.caption(
+        f"Llamadas a la API: {counters.get('api_calls', 0)} · "
+        f"Descargado: {counters.get('bytes_fetched', 0) / 1024:,.0f} KiB · "
+        f"Copias locales usadas: {counters.get('snapshot_hits', 0)}"
+    )
+    if snapshot["stats"]:
+        st.dataframe(
+            [
+                {
+                    "Etapa": name,
+                    "Llamadas": stats["calls"],
+                    "Última (ms)": round(stats["last"] * 1000, 1),
+                    "Promedio (ms)": round(stats["total"] / stats["calls"] * 1000, 1),
+                    "Máx. (ms)": round(stats["max"] * 1000, 1),
+                    "Errores": stats["errors"],
+                }
+                for name, stats in sorted(snapshot["stats"].items())
+            ],
+            use_container_width=True,
+            hide_index=True,
+        )
+    else:
+        st.write("Sin mediciones todavía.")
+    if st.button("Reiniciar mediciones", use_container_width=True):
+        recorder.reset()
 
-        st.session_state.messages.append({"type": "success", "content": f"Playlist exportada correctamente a Google Sheets: {spreadsheet.url} -> {sheet_title}"})
-    except Exception as e:
-        st.session_state.messages.append({"type": "error", "content": f"Error al exportar a Google Sheets: {e}"})
-
-# Función para generar la playlist
-def generate_playlist(start_time, end_time, promos, fillers, user_programs):
-    current_time = start_time
-    playlist = []
-    block_counter = 1
-    user_program_index = 0
-    item_counter = 1
-
-    # Calcular el tiempo total de la playlist
-    total_time = (end_time - start_time).total_seconds()
-    elapsed_time = 0
-
-    # Barra de progreso
-    progress_bar = st.progress(0)
-    status_text = st.empty()  # Para mostrar el estado actual
-
-    # Agregar tanda de 60 segundos al inicio
-    tanda_duration = 60
-    playlist.append({
-        "item": item_counter,
-        "start_time": current_time.strftime("%H:%M:%S"),
-        "name": "Tanda 60 segundos",
-        "duration": str(timedelta(seconds=tanda_duration)),
-        "type": "Tanda",
-        "block": block_counter
-    })
-    item_counter += 1
-    current_time += timedelta(seconds=tanda_duration)
-    elapsed_time += tanda_duration
-
-    # Actualizar barra de progreso
-    progress = min(elapsed_time / total_time, 1.0)
-    progress_bar.progress(progress)
-    status_text.text(f"Generando playlist... {int(progress * 100)}% completado")
-
-    while current_time < end_time:
-        if user_program_index < len(user_programs):
-            program = user_programs[user_program_index]
-            program_duration = parse_duration(program["duration"])
-            playlist.append({
-                "item": item_counter,
-                "start_time": current_time.strftime("%H:%M:%S"),
-                "name": program["name"],
-                "duration": program["duration"],
-                "type": "Program",
-                "block": block_counter
-            })
-            item_counter += 1
-            current_time += timedelta(seconds=program_duration)
-            elapsed_time += program_duration
-            user_program_index += 1
-
-            # Actualizar barra de progreso
-            progress = min(elapsed_time / total_time, 1.0)
-            progress_bar.progress(progress)
-            status_text.text(f"Generando playlist... {int(progress * 100)}% completado")
-        else:
-            break
-
-        # Agregar tanda de 60 segundos después del programa
-        tanda_duration = 60
-        playlist.append({
-            "item": item_counter,
-            "start_time": current_time.strftime("%H:%M:%S"),
-            "name": "Tanda 60 segundos",
-            "duration": str(timedelta(seconds=tanda_duration)),
-            "type": "Tanda",
-            "block": block_counter
-        })
-        item_counter += 1
-        current_time += timedelta(seconds=tanda_duration)
-        elapsed_time += tanda_duration
-
-        # Actualizar barra de progreso
-        progress = min(elapsed_time / total_time, 1.0)
-        progress_bar.progress(progress)
-        status_text.text(f"Generando playlist... {int(progress * 100)}% completado")
-
-        # Calcular tiempo restante en el bloque
-        time_to_next_block = calculate_time_to_next_block(current_time)
-        remaining_time = time_to_next_block.seconds
-
-        # Agregar promos y rellenos
-        if remaining_time > 0:
-            selected_content = select_content(remaining_time, promos + fillers)
-            for content in selected_content:
-                playlist.append({
-                    "item": item_counter,
-                    "start_time": current_time.strftime("%H:%M:%S"),
-                    "name": content['name'],
-                    "duration": str(timedelta(seconds=content['duration'])),
-                    "type": "Promo" if content in promos else "Filler",
-                    "block": block_counter
-                })
-                item_counter += 1
-                current_time += timedelta(seconds=content['duration'])
-                elapsed_time += content['duration']
-
-                # Actualizar barra de progreso
-                progress = min(elapsed_time / total_time, 1.0)
-                progress_bar.progress(progress)
-                status_text.text(f"Generando playlist... {int(progress * 100)}% completado")
-
-            if remaining_time > 0:
-                playlist.append({
-                    "item": item_counter,
-                    "start_time": current_time.strftime("%H:%M:%S"),
-                    "name": "Tanda Parcial",
-                    "duration": str(timedelta(seconds=remaining_time)),
-                    "type": "Tanda",
-                    "block": block_counter
-                })
-                item_counter += 1
-                current_time += timedelta(seconds=remaining_time)
-                elapsed_time += remaining_time
-
-                # Actualizar barra de progreso
-                progress = min(elapsed_time / total_time, 1.0)
-                progress_bar.progress(progress)
-                status_text.text(f"Generando playlist... {int(progress * 100)}% completado")
-
-        block_counter += 1
-
-    # Finalizar barra de progreso
-    progress_bar.progress(1.0)
-    status_text.text("Playlist generada exitosamente 🎉")
-
-    return playlist
-
-# Función para convertir duración en formato HH:MM:SS a segundos
-def parse_duration(duration_str):
-    h, m, s = map(int, duration_str.split(':'))
-    return h * 3600 + m * 60 + s
-
-# Función para calcular el tiempo hasta el siguiente bloque
-def calculate_time_to_next_block(current_time):
-    valid_start_minutes = [0, 10, 15, 20, 30, 40, 45, 50, 0]
-    current_minute = current_time.minute
-    next_minute = next((m for m in valid_start_minutes if m > current_minute), valid_start_minutes[0])
-    next_block_time = current_time.replace(minute=next_minute, second=0, microsecond=0)
-    if next_block_time <= current_time:
-        next_block_time += timedelta(hours=1)
-    return next_block_time - current_time
-
-# Función para seleccionar contenido
-def select_content(duration_seconds, content_list):
-    random.shuffle(content_list)
-    selected = []
-    remaining_seconds = duration_seconds
-    content_list.sort(key=lambda x: x['duration'], reverse=True)
-    for content in content_list:
-        if content['duration'] <= remaining_seconds:
-            selected.append(content)
-            remaining_seconds -= content['duration']
-        if remaining_seconds <= 0:
-            break
-    return selected
 
 # Interfaz de Streamlit
 def main():
+    # Configuración inicial de la página (debe ser la primera llamada).
+    # Se hace aquí y no al importar para que el módulo se pueda importar sin Streamlit.
+    st.set_page_config(
+        page_title="Gestor de Playlists 24h",
+        page_icon="🎧",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    configure_json_logs()
+
     # Configurar el tema
     setup_theme()
 
@@ -420,6 +579,9 @@ def main():
         st.session_state.messages = []
     if 'programs' not in st.session_state:
         st.session_state.programs = []
+    if 'jobs' not in st.session_state:
+        st.session_state.jobs = []
+    st.session_state.load_timings = {}
 
     # ------------------------------------------------------
     # Barra Lateral (Todo el contenido del sidebar aquí)
@@ -437,18 +599,50 @@ def main():
                 elif msg["type"] == "warning":
                     st.warning(msg["content"], icon="⚠️")
 
+        # Sección de Rendimiento (tiempos de las etapas del proceso)
+        with st.expander("⏱️ Rendimiento"):
+            show_performance()
+
         st.markdown("---")
         
         # Sección Principal de Configuración
         st.header("⚙️ Configuración Principal")
-        
+
+        # Caché del catálogo: refresco manual y contadores de aciertos/fallos
+        catalog_cache = get_catalog_cache()
+        if st.button("🔄 Refrescar catálogo", use_container_width=True, help="Vuelve a descargar programas, promos y rellenos"):
+            catalog_cache.invalidate()
+            st.session_state.messages.append({"type": "success", "content": "Catálogo marcado para recarga"})
+        cache_stats = catalog_cache.stats()
+        st.caption(f"Caché del catálogo: {cache_stats['hits']} aciertos · {cache_stats['misses']} fallos · TTL {catalog_cache.ttl}s")
+        playlist_stats = get_playlist_cache().stats()
+        st.caption(
+            f"Caché de playlists: {playlist_stats['entries']} guardadas · {playlist_stats['bytes'] / 1024 / 1024:.1f} MiB · "
+            f"{playlist_stats['hits']} aciertos · {playlist_stats['misses']} fallos"
+        )
+        job_stats = get_job_queue().stats()
+        st.caption(f"Trabajos: {job_stats['running']} en curso · {job_stats['pending']} en cola · {job_stats['workers']} hilos")
+
+        # Lanzar en paralelo la carga de promos, programas y la lista de hojas;
+        # los rellenos se piden en cuanto se conoce la hoja seleccionada
+        promos_future = programs_future = sheets_future = fillers_future = grids_future = None
+        if authenticate_google_sheets():
+            catalog_sync = get_catalog_sync()
+            loader_pool = get_loader_pool()
+            promos_future = loader_pool.submit(timed_load, load_promos, catalog_sync, catalog_cache)
+            programs_future = loader_pool.submit(timed_load, load_programs, catalog_sync, catalog_cache)
+            sheets_future = loader_pool.submit(timed_load, list_sheets, catalog_sync, catalog_cache)
+            grids_future = loader_pool.submit(timed_load, load_block_grids, catalog_sync, catalog_cache)
+
         # Selector de hoja de rellenos
-        sheets = list_sheets()
+        sheets = collect_load(sheets_future, "Hojas")
         selected_sheet = st.selectbox(
             "📂 Seleccionar hoja de rellenos:", 
             sheets if sheets else ["No disponible"],
             disabled=not sheets
         )
+        if sheets:
+            fillers_future = loader_pool.submit(timed_load, load_fillers, catalog_sync, catalog_cache, selected_sheet)
         
         st.markdown("---")
         
@@ -456,15 +650,24 @@ def main():
         st.subheader("⏰ Configuración de Horarios")
         start_time = st.time_input("Hora de inicio", value=datetime.strptime("05:59:00", "%H:%M:%S").time())
         end_time = st.time_input("Hora de fin", value=datetime.strptime("23:59:00", "%H:%M:%S").time())
+        if end_time <= start_time:
+            st.caption("🌙 La ventana cruza la medianoche")
+        seed = st.number_input(
+            "Semilla", min_value=0, value=0, key="playlist_seed",
+            help="La misma semilla con los mismos catálogos y horarios reproduce la playlist (se recupera de la caché)",
+        )
+
+        # Grilla de bloques del canal seleccionado
+        block_grids = collect_load(grids_future, "Grillas") or {}
+        grid = grid_for(block_grids, selected_sheet)
+        st.caption("🧱 Bloques en los minutos " + ", ".join(f":{minute:02d}" for minute in grid.minutes))
 
         # Mostrar la lista de programas en una tabla
         st.markdown("---")
         st.subheader("📋 Lista de Programas")
         if st.session_state.programs:
-            # Convertir la lista de programas en un DataFrame
-            programs_df = pd.DataFrame(st.session_state.programs)
-            # Mostrar la tabla en el sidebar
-            st.dataframe(programs_df, use_container_width=True, hide_index=True)
+            # Mostrar la tabla en el sidebar (el DataFrame se reutiliza entre ejecuciones)
+            st.dataframe(get_programs_frame(st.session_state.programs), use_container_width=True, hide_index=True)
         else:
             st.write("No hay programas cargados.")
 
@@ -476,42 +679,62 @@ def main():
 
     # Cargar datos
     with st.spinner("🔍 Cargando programas y promos..."): 
-        promos = load_promos_from_google_sheet()
-        user_programs = load_programs_from_google_sheet()
-        fillers = load_fillers_from_google_sheet(selected_sheet) if sheets else []
+        promos = collect_load(promos_future, "Promos")
+        user_programs = collect_load(programs_future, "Programas")
+        fillers = collect_load(fillers_future, "Rellenos")
 
         # Actualizar la lista de programas en el estado de la sesión
         st.session_state.programs = user_programs
 
+    # Tiempo de carga por fuente
+    if st.session_state.load_timings:
+        st.caption("⏱️ Carga: " + " · ".join(f"{source} {elapsed:.2f}s" for source, elapsed in st.session_state.load_timings.items()))
+
     # Generar playlist
     col1, col2 = st.columns([1,3])
     with col1:
-        if st.button("🎶 Generar Playlist", type="primary", help="Genera una nueva playlist basada en los parámetros actuales"):
+        if st.button(
+            "🎶 Generar Playlist", type="primary", disabled=job_running("generate"),
+            help="Genera una nueva playlist basada en los parámetros actuales",
+        ):
             if not user_programs or not promos or not fillers:
                 st.session_state.messages.append({"type": "warning", "content": "Faltan datos para generar la playlist"})
             else:
-                start_time_dt = datetime.combine(datetime.today(), start_time)
-                end_time_dt = datetime.combine(datetime.today(), end_time)
-                playlist = generate_playlist(start_time_dt, end_time_dt, promos, fillers, user_programs)
-                st.session_state.playlist = playlist
-                st.session_state.messages.append({"type": "success", "content": "Playlist generada correctamente"})
+                generate_playlist(start_time, end_time, get_catalog_index(promos, fillers), user_programs, grid, int(seed))
+
+    # Generación por lotes (varios días y canales)
+    with st.expander("📆 Generación por lotes"):
+        col_batch1, col_batch2, col_batch3 = st.columns(3)
+        with col_batch1:
+            batch_first_day = st.date_input("Primer día", value=datetime.today())
+        with col_batch2:
+            batch_days = st.number_input("Días", min_value=1, max_value=31, value=7)
+        with col_batch3:
+            batch_seed = st.number_input("Semilla", min_value=0, value=0, help="La misma semilla reproduce el mismo lote")
+        batch_channels = st.multiselect("Canales (hojas de rellenos)", sheets, default=sheets)
+        if st.button("⚙️ Generar lote", disabled=not sheets or job_running("batch")):
+            if not user_programs or not promos or not batch_channels:
+                st.session_state.messages.append({"type": "warning", "content": "Faltan datos para generar el lote"})
+            else:
+                generate_batch(batch_first_day, int(batch_days), batch_channels, int(batch_seed), start_time, end_time, promos, user_programs, block_grids)
+        if st.session_state.get("batch_export"):
+            st.download_button(
+                "📦 Descargar lote (Excel)",
+                data=st.session_state.batch_export,
+                file_name=st.session_state.batch_export_name,
+                mime=XLSX_MIME,
+            )
+
+    # Trabajos en segundo plano de la sesión (generación, lotes y exportaciones)
+    show_jobs()
 
     # Vista previa de playlist
     if st.session_state.playlist:
         st.markdown("### 📜 Vista Previa")
-        st.dataframe(
-            st.session_state.playlist,
-            column_config={
-                "item": "Ítem",
-                "start_time": {"label": "Hora Inicio", "help": "Hora de inicio del bloque"},
-                "name": "Contenido",
-                "duration": "Duración",
-                "type": {"label": "Tipo", "help": "Tipo de contenido (Programa, Tanda, etc.)"}
-            },
-            use_container_width=True,
-            hide_index=True
-        )
-        
+        show_preview(st.session_state.playlist)
+        if st.session_state.get("playlist_context"):
+            show_editor(st.session_state.playlist, user_programs or [])
+
         # Sección de Exportación
         st.markdown("---")
         st.markdown("### 📤 Exportar Playlist")
@@ -538,6 +761,14 @@ def main():
                     export_to_excel(st.session_state.playlist)
                 else:
                     st.session_state.messages.append({"type": "error", "content": "No hay playlist para exportar"})
+            if st.session_state.get("excel_export"):
+                st.download_button(
+                    "⬇️ Descargar Excel",
+                    data=st.session_state.excel_export,
+                    file_name=st.session_state.excel_export_name,
+                    mime=XLSX_MIME,
+                    use_container_width=True,
+                )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
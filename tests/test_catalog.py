@@ -0,0 +1,54 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import MAX_REPORTED_ROWS, parse_catalog, parse_durations  # noqa: E402
+
+
+def parse(values):
+    seconds, invalid = parse_durations(values)
+    return [None if wrong else value for value, wrong in zip(seconds.tolist(), invalid.tolist())]
+
+
+def test_fixed_width_formats():
+    assert parse(["01:02:03", "1:02:03", "02:03", "00:00:00"]) == [3723, 3723, 123, 0]
+
+
+def test_plain_seconds():
+    assert parse(["45", "0", "120.0", "3600.00", 90]) == [45, 0, 120, 3600, 90]
+
+
+def test_surrounding_whitespace():
+    assert parse([" 1:02:03", "02:03 ", "\t45\n"]) == [3723, 123, 45]
+
+
+def test_uncommon_formats_fall_back_to_the_pattern():
+    assert parse(["100:00:00", "1:5", "0:0:7"]) == [360000, 65, 7]
+
+
+def test_invalid_rows():
+    assert parse(["1:60:00", "00:61", "", None, 3.5, "-5", "1:02:03:04", "ab:cd"]) == [None] * 8
+
+
+def test_empty_column():
+    assert parse([]) == []
+
+
+def test_parse_catalog_reports_bad_rows_once():
+    data = [{"Name": f"Promo {i}", "Duration": "xx"} for i in range(MAX_REPORTED_ROWS + 2)]
+    data.append({"Name": "Buena", "Duration": "0:00:30"})
+    messages = []
+    items = parse_catalog(data, "promos", messages)
+    assert items == [{"name": "Buena", "duration": 30}]
+    assert len(messages) == 1
+    assert messages[0]["type"] == "error"
+    assert messages[0]["content"].startswith(f"{MAX_REPORTED_ROWS + 2} promos con duración inválida")
+    assert messages[0]["content"].endswith("y 2 más")
+
+
+def test_parse_catalog_reads_numeric_names_as_text():
+    messages = []
+    items = parse_catalog([{"Name": 1984, "Duration": "0:30:00"}, {"Name": 24.5, "Duration": 60}], "programas", messages)
+    assert items == [{"name": "1984", "duration": 1800}, {"name": "24.5", "duration": 60}]
+    assert messages == []
@@ -0,0 +1,139 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playlist_engine import (  # noqa: E402
+    DEFAULT_GRID,
+    FILLER,
+    FIXED_TANDA_NAME,
+    PROGRAM,
+    PROMO,
+    TYPE_CODES,
+    BlockBoundaries,
+    CatalogIndex,
+    PlaylistEditor,
+    generate,
+)
+
+
+START_CLOCK = 6 * 3600
+WINDOW = 18 * 3600
+SEED = 7
+
+
+def make_inputs():
+    rng = random.Random(SEED)
+    programs = [(f"Programa {i}", rng.randint(20, 50) * 60) for i in range(200)]
+    entries = [(f"Promo {i}", rng.randint(5, 60), PROMO) for i in range(120)]
+    entries += [(f"Relleno {i}", rng.randint(1, 30), FILLER) for i in range(120)]
+    return programs, CatalogIndex(entries)
+
+
+def make_editor():
+    programs, index = make_inputs()
+    playlist = generate(START_CLOCK, WINDOW, programs, index, seed=SEED)
+    return PlaylistEditor(playlist, index, WINDOW, seed=SEED, programs=programs)
+
+
+# Inicios contiguos, cada bloque termina en un inicio de bloque de la grilla
+# y la playlist cubre la ventana
+def check_invariants(playlist):
+    boundaries = BlockBoundaries(DEFAULT_GRID, START_CLOCK, WINDOW)
+    cursor = 0
+    for i in range(len(playlist)):
+        assert playlist.starts[i] == cursor
+        cursor += playlist.durations[i]
+    blocks = list(playlist.blocks)
+    assert blocks == sorted(blocks)
+    assert sorted(set(blocks)) == list(range(1, blocks[-1] + 1))
+    offsets = set(boundaries.offsets)
+    for i in range(len(playlist) - 1):
+        if blocks[i + 1] != blocks[i]:
+            assert playlist.starts[i + 1] in offsets
+    assert playlist.total_seconds in offsets
+    assert playlist.total_seconds >= WINDOW
+    program_starts = [
+        start for start, code in zip(playlist.starts, playlist.type_codes) if code == TYPE_CODES[PROGRAM]
+    ]
+    assert program_starts[-1] < WINDOW
+
+
+def find_item(playlist, type):
+    return next(i for i in range(len(playlist)) if playlist.type_codes[i] == TYPE_CODES[type])
+
+
+def test_generated_playlist_holds_invariants():
+    check_invariants(make_editor().playlist)
+
+
+def test_item_longer_than_its_break_is_kept():
+    editor = make_editor()
+    playlist = editor.playlist
+    position = find_item(playlist, PROMO)
+    editor.update_item(position, name="EDITADO", duration=2000)
+    assert playlist[position].name == "EDITADO"
+    assert playlist[position].duration == 2000
+    check_invariants(playlist)
+
+
+def test_inserted_item_longer_than_its_break_is_kept():
+    editor = make_editor()
+    playlist = editor.playlist
+    position = find_item(playlist, PROMO)
+    editor.insert_item(position, "NUEVO", 1500)
+    assert playlist[position].name == "NUEVO"
+    assert playlist[position].duration == 1500
+    check_invariants(playlist)
+
+
+def test_removed_blocks_are_refilled_up_to_the_window():
+    editor = make_editor()
+    used = editor.next_program
+    editor.remove_program(1)
+    editor.remove_program(1)
+    assert editor.next_program > used
+    check_invariants(editor.playlist)
+
+
+def test_removing_the_last_block_refills_it():
+    editor = make_editor()
+    editor.remove_program(editor.playlist.blocks[-1])
+    check_invariants(editor.playlist)
+
+
+def test_block_past_the_window_is_rejected():
+    editor = make_editor()
+    playlist = editor.playlist
+    before = (list(playlist.starts), list(playlist.name_ids))
+    with pytest.raises(IndexError):
+        editor.insert_program(playlist.blocks[-1] + 1, "NUEVO", 1800)
+    assert (list(playlist.starts), list(playlist.name_ids)) == before
+
+
+def test_fixed_tandas_cannot_be_removed_or_split():
+    editor = make_editor()
+    playlist = editor.playlist
+    program = find_item(playlist, PROGRAM)
+    with pytest.raises(IndexError):
+        editor.remove_item(program + 1)
+    with pytest.raises(IndexError):
+        editor.remove_item(0)
+    with pytest.raises(IndexError):
+        editor.insert_item(program + 1, "NUEVO", 10)
+    editor.replace_program(playlist.blocks[program], "OTRO", 1800)
+    assert playlist[program + 1].name == FIXED_TANDA_NAME
+    check_invariants(playlist)
+
+
+def test_item_inserted_before_a_program_joins_the_previous_break():
+    editor = make_editor()
+    playlist = editor.playlist
+    second = [i for i in range(len(playlist)) if playlist.type_codes[i] == TYPE_CODES[PROGRAM]][1]
+    block = playlist.blocks[second - 1]
+    editor.insert_item(second, "NUEVO", 20)
+    assert [item.block for item in playlist if item.name == "NUEVO"] == [block]
+    check_invariants(playlist)